@@ -0,0 +1,81 @@
+"""Paraphrase the whole CSSS in a single structured-output request.
+
+The model is asked for a JSON object holding one item per question. Each item
+is validated on its own, so a malformed entry only costs a per-item call for
+that question rather than a retry of the whole batch.
+"""
+import json
+
+from pydantic import BaseModel, Field, ValidationError
+
+import completions
+import paraphrase_cache
+
+BATCH_PROMPT = """
+You are a supportive chatbot helping with a stress questionnaire for college students.
+Below are {count} numbered stress questions.
+{instructions}
+Respond with a JSON object of the form {{"items": [{{"index": 1, "text": "..."}}, ...]}}
+containing exactly one item per question, where "index" is the question number.
+
+Questions:
+{numbered}
+"""
+
+
+class ParaphraseItem(BaseModel):
+    index: int = Field(ge=1)
+    text: str = Field(min_length=1)
+
+
+class ParaphraseBatch(BaseModel):
+    items: list
+
+
+def batch_template(instructions):
+    """The prompt template actually sent, used as the paraphrase cache key."""
+    return BATCH_PROMPT.replace("{instructions}", instructions)
+
+
+def parse_batch(content, count):
+    """Validated texts by position; entries that fail validation are None."""
+    texts = [None] * count
+    try:
+        batch = ParaphraseBatch.model_validate(json.loads(content))
+    except (ValueError, ValidationError):
+        return texts
+    for raw in batch.items:
+        try:
+            item = ParaphraseItem.model_validate(raw)
+        except ValidationError:
+            continue
+        text = item.text.strip()
+        if item.index <= count and text and texts[item.index - 1] is None:
+            texts[item.index - 1] = text
+    return texts
+
+
+def paraphrase_batch(client, questions, instructions, model, fallback):
+    """Paraphrase `questions` in one request, calling `fallback(question)` for
+    every entry that is missing or fails validation."""
+    if not questions:
+        return []
+    prompt = batch_template(instructions).format(
+        count=len(questions),
+        numbered="\n".join(f'{i}. "{q}"' for i, q in enumerate(questions, start=1)),
+    )
+    try:
+        content = completions.complete(
+            client, model, prompt, call_type="paraphrase_batch", response_format={"type": "json_object"}
+        )
+        texts = parse_batch(content, len(questions))
+    except Exception:
+        texts = [None] * len(questions)
+
+    missing = [i for i, text in enumerate(texts) if text is None]
+    # On the shared paraphrase pool. A fallback still queued there is run here
+    # instead, so a batch that is itself running on that pool never waits on it.
+    futures = {i: paraphrase_cache.get_executor().submit(fallback, questions[i]) for i in missing}
+    for i, future in futures.items():
+        texts[i] = fallback(questions[i]) if future.cancel() else future.result()
+    return texts
@@ -0,0 +1,174 @@
+"""Micro-benchmarks for the chatbot's hot paths, with OpenAI replayed from fixtures.
+
+Every LLM call is answered instantly from bench/fixtures/llm_responses.json, so
+the timings are our own overhead (prompt building, client plumbing, parsing,
+caching, rendering, persistence) and are deterministic and offline.
+
+    python bench/bench_hot_paths.py                 # replay, print a table
+    python bench/bench_hot_paths.py --json out.json # also save results
+    python bench/bench_hot_paths.py --record        # (re)record fixtures from OPENAI_BASE_URL / the real API
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, HERE)
+
+os.environ.setdefault("OPENAI_API_KEY", "replay")
+os.environ.pop("RESPONSE_BANK_PATH", None)
+os.environ.setdefault("LLM_METRICS_FILE", os.path.join(tempfile.gettempdir(), "bench_hot_paths_llm_metrics.jsonl"))
+
+import chat_generators  # noqa: E402
+import chat_render  # noqa: E402
+import persistence  # noqa: E402
+import responses_store  # noqa: E402
+from llm_replay import RecordReplayClient  # noqa: E402
+
+FIXTURES = os.path.join(HERE, "fixtures", "llm_responses.json")
+CSV_SIZES = [0, 1000, 10000]
+
+
+def measure(fn, repeat, number=1):
+    """Per-call seconds for `repeat` rounds of `number` calls."""
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def sample_session():
+    questions = chat_generators.csss_questions
+    history, answers = [], []
+    for i, question in enumerate(questions):
+        answer = chat_generators.likert_options[i % 5]
+        history.append({"type": "main_q" if i == 0 else "empathy_plus_next_q", "text": f"Bot message about {question}. " * 3})
+        history.append({"type": "main_a", "text": answer})
+        entry = {"question": question, "paraphrased": f"Paraphrase of {question}.", "answer": answer,
+                 "followup": None, "followup_answer": None}
+        if answer in ["Often", "Very Often"]:
+            history.append({"type": "followup_q", "text": f"Follow-up about {question}? " * 3})
+            history.append({"type": "followup_a", "text": "Sometimes"})
+            entry["followup"] = history[-2]["text"]
+            entry["followup_answer"] = "Sometimes"
+        answers.append(entry)
+    return history, answers
+
+
+def sample_row(answers):
+    return {
+        "user_id": "bench-user",
+        "timestamp": "2026-01-01T00:00:00",
+        "chatbot_duration_seconds": 321.5,
+        "student": "Yes",
+        "age": 21,
+        "consent": True,
+        "email": "bench@example.edu",
+        "chatbot_conversation": json.dumps(answers),
+        **{f"Survey question {i}": "4 – Agree" for i in range(15)},
+        "What did you like most about this chatbot?": "Feedback",
+        "What did you find frustrating or confusing?": "Feedback",
+        "Do you have any suggestions to improve this chatbot?": "Feedback",
+        "model": "model1",
+    }
+
+
+def llm_benchmarks():
+    questions = chat_generators.csss_questions
+    noop = lambda text: None  # noqa: E731
+    return {
+        "generate_question_paraphrased": lambda: [chat_generators.generate_question_paraphrased(q) for q in questions],
+        "generate_followup_with_empathy": lambda: [chat_generators.generate_followup_with_empathy(q, "Often") for q in questions],
+        "generate_followup_with_empathy[stream]": lambda: [
+            chat_generators.generate_followup_with_empathy(q, "Often", on_text=noop) for q in questions
+        ],
+        "generate_empathy_plus_next_question": lambda: [
+            chat_generators.generate_empathy_plus_next_question(q, "Never", n) for q, n in zip(questions, questions[1:])
+        ],
+        "generate_question_with_empathy": lambda: [chat_generators.generate_question_with_empathy(q) for q in questions],
+        "generate_followup": lambda: [chat_generators.generate_followup(q) for q in questions],
+    }
+
+
+def run(args):
+    client = RecordReplayClient(args.fixtures, record=args.record, upstream=None)
+    if args.record:
+        from openai import OpenAI
+        client.upstream = OpenAI()
+    chat_generators.client = client
+
+    results = {}
+    per_call = len(chat_generators.csss_questions)
+    for name, fn in llm_benchmarks().items():
+        calls_before = client.calls
+        fn()
+        calls = client.calls - calls_before
+        samples = measure(fn, 1 if args.record else args.repeat)
+        results[name] = [s / max(calls, 1) for s in samples]
+    if args.record:
+        client.save()
+        print(f"recorded {len(client.fixtures)} responses to {args.fixtures}")
+        return {}
+
+    history, answers = sample_session()
+    results[f"render_chat_history[{len(history)} msgs]"] = measure(
+        lambda: chat_render.render_chat_history(history), args.repeat
+    )
+
+    workdir = tempfile.mkdtemp(prefix="csss-bench-")
+    try:
+        row = sample_row(answers)
+        spool = persistence.PersistenceWorker({}, os.path.join(workdir, "spool.jsonl"), os.path.join(workdir, "done.jsonl"))
+        results["submit: build row + spool"] = measure(
+            lambda: spool.submit(sample_row(answers)), args.repeat, number=per_call
+        )
+        for size in CSV_SIZES:
+            path = os.path.join(workdir, f"responses_{size}.csv")
+            for _ in range(size):
+                responses_store.append_row(row, path)
+            results[f"submit: CSV append @ {size} rows"] = measure(
+                lambda: responses_store.append_row(row, path), args.repeat
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_table(results):
+    print(f"{'benchmark':<48} {'min':>10} {'median':>10} {'mean':>10} {'p95':>10}")
+    for name, samples in results.items():
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+        print(f"{name:<48} {ordered[0] * 1e6:>8.1f}us {statistics.median(ordered) * 1e6:>8.1f}us "
+              f"{statistics.fmean(ordered) * 1e6:>8.1f}us {p95 * 1e6:>8.1f}us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the chatbot hot paths.")
+    parser.add_argument("--repeat", type=int, default=20, help="timed rounds per benchmark")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--record", action="store_true", help="record missing responses from the live API")
+    parser.add_argument("--json", help="also write raw per-call timings (seconds) to this file")
+    args = parser.parse_args(argv)
+    results = run(args)
+    if not results:
+        return
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
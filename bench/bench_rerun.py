@@ -0,0 +1,105 @@
+"""Per-rerun script time for chat_model1.py.
+
+Streamlit re-executes the whole script on every click, so whatever the top of
+the script does is paid on every interaction. This runs the app in-process
+with streamlit.testing's AppTest against the local OpenAI stand-in (with a
+GOOGLE_SERVICE_ACCOUNT secret set, like production) and times: the first run
+(cold process: imports and one-time setup), plain reruns of the intro page,
+and plain reruns of the chat page. AppTest polls for the script to finish, so
+wall time is coarse; process CPU time per run is the number to compare.
+
+    python bench/bench_rerun.py
+    python bench/bench_rerun.py --reruns 100 --json rerun.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "loadtest"))
+
+import stub_openai  # noqa: E402
+
+
+def timed_run(at):
+    """(wall seconds, process CPU seconds) for one script run."""
+    start, cpu_start = time.perf_counter(), time.process_time()
+    at.run()
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    if at.exception:
+        raise RuntimeError(f"app raised: {at.exception[0].message}")
+    return elapsed, cpu
+
+
+def new_app(page=None):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(REPO_ROOT, "chat_model1.py"), default_timeout=60)
+    at.secrets["GOOGLE_SERVICE_ACCOUNT"] = json.dumps({"type": "service_account", "project_id": "bench"})
+    if page is not None:
+        # AppTest keeps stale widgets across a page switch into a fragment, so start on the page directly
+        at.session_state["page"] = page
+        at.session_state["participant_info"] = {"student": "Yes", "age": 21, "consent": True, "email": "bench@example.edu"}
+    return at
+
+
+def run(args):
+    server, base_url = stub_openai.start_stub(config=stub_openai.StubConfig(latency=0.0, token_delay=0.0))
+    workdir = tempfile.mkdtemp(prefix="csss-rerun-")
+    cwd = os.getcwd()
+    os.environ.update(
+        OPENAI_BASE_URL=base_url,
+        OPENAI_API_KEY="stub",
+        PARAPHRASE_CACHE_DIR=os.path.join(workdir, "paraphrase_cache"),
+        LLM_METRICS_FILE=os.path.join(workdir, "llm_metrics.jsonl"),
+        PERSIST_SPOOL_FILE=os.path.join(workdir, "spool.jsonl"),
+        PERSIST_DONE_FILE=os.path.join(workdir, "done.jsonl"),
+        PREFETCH_TURNS="0",
+    )
+    os.environ.pop("RESPONSE_BANK_PATH", None)
+    try:
+        os.chdir(workdir)
+        at = new_app()
+        results = {"first run (cold process)": [timed_run(at)]}
+        results["intro page rerun"] = [timed_run(at) for _ in range(args.reruns)]
+
+        at = new_app(page="chat")
+        timed_run(at)  # paraphrases the questions once
+        results["chat page rerun"] = [timed_run(at) for _ in range(args.reruns)]
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_table(results):
+    print(f"{'script run':<28} {'n':>5} {'wall median':>12} {'cpu median':>11} {'cpu mean':>9}")
+    for name, samples in results.items():
+        wall = [w for w, _ in samples]
+        cpu = [c for _, c in samples]
+        print(f"{name:<28} {len(samples):>5} {statistics.median(wall) * 1e3:>10.2f}ms "
+              f"{statistics.median(cpu) * 1e3:>9.2f}ms {statistics.fmean(cpu) * 1e3:>7.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-rerun script time for chat_model1.py.")
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--json", help="also write raw (wall, cpu) timings in seconds to this file")
+    args = parser.parse_args(argv)
+    results = run(args)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Record/replay stand-in for the OpenAI client used by the benchmarks.
+
+Responses are stored in a JSON fixture keyed by a hash of the request (model,
+messages, response_format). In replay mode the client answers instantly from
+the fixture, so benchmarks are deterministic, offline and measure only our own
+overhead. Streaming requests replay the stored text as word chunks.
+"""
+import hashlib
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+
+def request_key(kwargs):
+    raw = json.dumps(
+        {
+            "model": kwargs.get("model"),
+            "messages": kwargs.get("messages"),
+            "response_format": kwargs.get("response_format"),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _chunks(data):
+    text = data["choices"][0]["message"]["content"]
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        yield ChatCompletionChunk.model_validate({
+            "id": data["id"],
+            "object": "chat.completion.chunk",
+            "created": data["created"],
+            "model": data["model"],
+            "choices": [{
+                "index": 0,
+                "delta": {"content": word if i == 0 else " " + word},
+                "finish_reason": "stop" if i == len(words) - 1 else None,
+            }],
+        })
+
+
+class RecordReplayClient:
+    """Duck-types `client.chat.completions.create` for the chatbot generators."""
+
+    def __init__(self, fixture_path, record=False, upstream=None):
+        self.fixture_path = fixture_path
+        self.record = record
+        self.upstream = upstream
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.fixtures = {}
+        if os.path.exists(fixture_path):
+            with open(fixture_path, encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        key = request_key(kwargs)
+        with self._lock:
+            self.calls += 1
+            data = self.fixtures.get(key)
+        if data is None:
+            if not self.record:
+                raise LookupError(
+                    f"No recorded response for this request in {self.fixture_path}; "
+                    "re-run the benchmarks with --record"
+                )
+            request = {k: v for k, v in kwargs.items() if k not in ("stream", "stream_options")}
+            data = self.upstream.chat.completions.create(**request).model_dump(mode="json")
+            with self._lock:
+                self.fixtures[key] = data
+        if kwargs.get("stream"):
+            return _chunks(data)
+        return ChatCompletion.model_validate(data)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.fixture_path)), exist_ok=True)
+        with open(self.fixture_path, "w", encoding="utf-8") as f:
+            json.dump(self.fixtures, f, indent=1, sort_keys=True, ensure_ascii=False)
@@ -0,0 +1,284 @@
+"""Prompts and LLM generators for the chatbot arms served by chat_model1.py.
+
+Kept out of the Streamlit script so offline tools (e.g. response_bank.py) can
+import them without running the app. ARMS lists, per study arm, how its
+questions are paraphrased; conversation.VARIANTS holds its turn flow.
+"""
+import logging
+import os
+import random
+import time
+import completions
+import batch_paraphrase
+import conversation
+import llm_client
+import llm_routes
+import paraphrase_cache
+import response_bank
+
+logger = logging.getLogger(__name__)
+
+# --- Setup OpenAI ---
+# Shared across sessions and reruns so calls reuse pooled keep-alive connections
+client = llm_client.get_client()
+async_client = llm_client.get_async_client()
+
+# Serving mode: answer from a pre-generated bank (see response_bank.py) instead of calling OpenAI
+RESPONSE_BANK_PATH = os.getenv("RESPONSE_BANK_PATH")
+bank = response_bank.get_bank(RESPONSE_BANK_PATH) if RESPONSE_BANK_PATH else None
+
+csss_questions = [
+    "Felt anxious or distressed about personal relationships",
+    "Felt anxious or distressed about family matters",
+    "Felt anxious or distressed about financial matters",
+    "Felt anxious or distressed about academic matters",
+    "Felt anxious or distressed about housing matters",
+    "Felt anxious or distressed about being away from home",
+    "Questioned your ability to handle difficulties in your life",
+    "Questioned your ability to attain your personal goals",
+    "Felt anxious or distressed because events were not going as planned",
+    "Felt as though you were NO longer in control of your life",
+    "Felt overwhelmed by difficulties in your life"
+]
+likert_options = ["Never", "Rarely", "Sometimes", "Often", "Very Often"]
+
+PARAPHRASE_MODEL = "gpt-4o"
+PARAPHRASE_PROMPT = """
+You are a supportive chatbot helping with a stress questionnaire for college students.
+Take this stress question:
+"{question}"
+Rephrase it in a more conversational, natural, and warm way. Do not add an empathy sentence here.
+Return as a single short paragraph.
+"""
+
+def generate_question_paraphrased(question):
+    if bank is not None:
+        text = bank.sample("paraphrase", question)
+        if text is not None:
+            return text
+    prompt = PARAPHRASE_PROMPT.format(question=question)
+    return completions.complete(client, PARAPHRASE_MODEL, prompt, call_type="paraphrase")
+
+# Batch mode: one structured-output request for the whole CSSS instead of one per question
+PARAPHRASE_BATCH = os.getenv("PARAPHRASE_BATCH", "0") == "1"
+PARAPHRASE_BATCH_INSTRUCTIONS = (
+    "Rephrase each one in a more conversational, natural, and warm way. Do not add an empathy sentence here.\n"
+    "Each rephrased question should be a single short paragraph."
+)
+
+def generate_questions_paraphrased_batch(questions):
+    return batch_paraphrase.paraphrase_batch(
+        client, questions, PARAPHRASE_BATCH_INSTRUCTIONS, PARAPHRASE_MODEL, generate_question_paraphrased
+    )
+
+# --- model1_csss arm: the paraphrase carries the empathy, follow-ups are plain questions ---
+EMPATHY_PARAPHRASE_PROMPT = """
+You are a supportive chatbot helping with a stress questionnaire for college students.
+Take this stress question:
+"{question}"
+1. Rephrase it in a more conversational, natural, and warm way.
+2. Add a brief empathetic comment after it.
+Return as a single short paragraph.
+"""
+EMPATHY_PARAPHRASE_BATCH_INSTRUCTIONS = (
+    "For each one:\n"
+    "1. Rephrase it in a more conversational, natural, and warm way.\n"
+    "2. Add a brief empathetic comment after it.\n"
+    "Each result should be a single short paragraph."
+)
+
+def generate_question_with_empathy(question):
+    if bank is not None:
+        text = bank.sample("paraphrase_empathy", question)
+        if text is not None:
+            return text
+    prompt = EMPATHY_PARAPHRASE_PROMPT.format(question=question)
+    return completions.complete(client, PARAPHRASE_MODEL, prompt, call_type="paraphrase")
+
+def generate_questions_with_empathy_batch(questions):
+    return batch_paraphrase.paraphrase_batch(
+        client, questions, EMPATHY_PARAPHRASE_BATCH_INSTRUCTIONS, PARAPHRASE_MODEL, generate_question_with_empathy
+    )
+
+# Paraphrasing per study arm; the arm name is saved in the "model" column
+ARMS = {
+    conversation.MODEL1: {
+        "prompt": PARAPHRASE_PROMPT,
+        "batch_instructions": PARAPHRASE_BATCH_INSTRUCTIONS,
+        "generate": generate_question_paraphrased,
+        "generate_batch": generate_questions_paraphrased_batch,
+    },
+    conversation.MODEL1_CSSS: {
+        "prompt": EMPATHY_PARAPHRASE_PROMPT,
+        "batch_instructions": EMPATHY_PARAPHRASE_BATCH_INSTRUCTIONS,
+        "generate": generate_question_with_empathy,
+        "generate_batch": generate_questions_with_empathy_batch,
+    },
+}
+
+def parse_arm_weights(spec):
+    """{arm: weight} from "model1=1,model1_csss=2" (a bare name weighs 1)."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in ARMS:
+            raise ValueError(f"unknown study arm {name!r}; expected one of {sorted(ARMS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+# Which arms new participants are assigned to, and how often
+ARM_WEIGHTS = parse_arm_weights(os.getenv("STUDY_ARMS", "model1=1,model1_csss=1"))
+
+def assign_arm(rng=random):
+    return rng.choices(list(ARM_WEIGHTS), weights=list(ARM_WEIGHTS.values()))[0]
+
+def followup_prompt(question, user_answer):
+    return f"""
+You are a supportive, creative chatbot for college students.
+Given the main question: "{question}"
+And the user's answer: "{user_answer}"
+Write a single message that contains:
+- First, a brief, warm, empathetic sentence acknowledging the user's answer. If the answer is positive ("Never", "Rarely"), use a positive/encouraging empathy ("I'm glad to hear this isn't a source of stress for you.", "It's good this doesn't often affect you.", etc). For "Sometimes", use a neutral empathy ("It's understandable to feel this way from time to time."). If negative ("Often", "Very Often"), be supportive/compassionate ("Dealing with this often can be very difficult to manage.", "I'm sorry to hear this is such a frequent struggle for you.", etc).
+- Then, in the same message, a varied, supportive follow-up question that is answerable on the Likert scale (Never, Rarely, Sometimes, Often, Very Often). Avoid always using "How often"; ask about impact, frequency, coping, or related feelings, but always use the Likert response style.
+Blend the empathy and the question smoothly in one message block, not as separate sentences.
+Return only the message.
+"""
+
+def empathy_next_prompt(prev_question, user_answer, next_question):
+    return f"""
+You are a supportive chatbot for college students. The user just answered a stress question: "{prev_question}" with "{user_answer}".
+Write a single message that:
+- Starts with a brief, warm, empathetic sentence acknowledging the user's answer (positive for "Never"/"Rarely", neutral for "Sometimes", supportive for "Often"/"Very Often").
+- Then, in the same message (new sentence), smoothly transition to the next question: "{next_question}" (make it conversational, not robotic).
+Do NOT ask for a Likert scale in the text, just present the question.
+Return only the message.
+"""
+
+def generate_followup_with_empathy(question, user_answer, on_text=None, budget=None):
+    if bank is not None:
+        text = bank.sample("followup", question, user_answer)
+        if text is not None:
+            return text
+    prompt = followup_prompt(question, user_answer)
+    return completions.complete(client, "gpt-4o", prompt, on_text=on_text, call_type="followup", budget=budget)
+
+def generate_empathy_plus_next_question(prev_question, user_answer, next_question, on_text=None, budget=None):
+    if bank is not None:
+        text = bank.sample("empathy_next", prev_question, user_answer)
+        if text is not None:
+            return text
+    prompt = empathy_next_prompt(prev_question, user_answer, next_question)
+    return completions.complete(client, "gpt-4o", prompt, on_text=on_text, call_type="empathy_next", budget=budget)
+
+def followup_question_prompt(question):
+    return f"""
+Given this original question: "{question}", write ONE short, simple follow-up question that is also answerable on a Likert scale (Never to Very Often). Make it feel natural and empathetic.
+Return only the question.
+"""
+
+def generate_followup(question, on_text=None, budget=None):
+    # model1_csss arm: a follow-up question without an empathy sentence
+    if bank is not None:
+        text = bank.sample("followup_question", question)
+        if text is not None:
+            return text
+    prompt = followup_question_prompt(question)
+    return completions.complete(client, "gpt-4o", prompt, on_text=on_text, call_type="followup", budget=budget)
+
+# Async counterparts on the shared event loop (llm_client.submit), e.g. for prefetched branches
+async def agenerate_followup_with_empathy(question, user_answer):
+    prompt = followup_prompt(question, user_answer)
+    return await completions.acomplete(async_client, "gpt-4o", prompt, call_type="followup")
+
+async def agenerate_empathy_plus_next_question(prev_question, user_answer, next_question):
+    prompt = empathy_next_prompt(prev_question, user_answer, next_question)
+    return await completions.acomplete(async_client, "gpt-4o", prompt, call_type="empathy_next")
+
+async def agenerate_followup(question):
+    return await completions.acomplete(async_client, "gpt-4o", followup_question_prompt(question), call_type="followup")
+
+# Generator that fulfils each kind of conversation.LLMRequest
+REQUEST_GENERATORS = {
+    "followup": generate_followup_with_empathy,
+    "empathy_next": generate_empathy_plus_next_question,
+    "followup_question": generate_followup,
+}
+ASYNC_REQUEST_GENERATORS = {
+    "followup": agenerate_followup_with_empathy,
+    "empathy_next": agenerate_empathy_plus_next_question,
+    "followup_question": agenerate_followup,
+}
+
+# --- Local fallbacks when a turn misses its latency budget or the LLM call fails ---
+TURN_BUDGET_SECONDS = float(os.getenv("TURN_BUDGET_SECONDS", "10"))
+
+# One empathy line per Likert answer, following the positive / neutral / supportive rules in the prompts
+EMPATHY_TEMPLATES = {
+    "Never": "I'm glad to hear this isn't a source of stress for you.",
+    "Rarely": "It's good this doesn't often affect you.",
+    "Sometimes": "It's understandable to feel this way from time to time.",
+    "Often": "Dealing with this often can be very difficult to manage.",
+    "Very Often": "I'm sorry to hear this is such a frequent struggle for you.",
+}
+FALLBACK_FOLLOWUP_QUESTION = "How often does this get in the way of your studies or daily life?"
+
+def fallback_question(question):
+    # "Felt anxious ..." -> "In the past month, how often have you felt anxious ...?"
+    return f"In the past month, how often have you {question[0].lower()}{question[1:]}?"
+
+def paraphrase_questions(arm, timeout=None):
+    """The arm's wording of every CSSS question, from the bank or the shared
+    paraphrase cache; any not back within `timeout` seconds is templated."""
+    spec = ARMS[arm]
+    if bank is not None:
+        return [spec["generate"](q) for q in csss_questions]
+    if PARAPHRASE_BATCH:
+        # Cached under the model the route actually sends to, so a routing change does not serve stale variants
+        return paraphrase_cache.get_cache().get_batch(
+            csss_questions, batch_paraphrase.batch_template(spec["batch_instructions"]),
+            llm_routes.model_for("paraphrase_batch", PARAPHRASE_MODEL), spec["generate_batch"],
+            timeout=timeout, fallback=fallback_question
+        )
+    return paraphrase_cache.get_cache().get_many(
+        csss_questions, spec["prompt"], llm_routes.model_for("paraphrase", PARAPHRASE_MODEL), spec["generate"],
+        timeout=timeout, fallback=fallback_question
+    )
+
+def fallback_message(request):
+    if request.kind == "followup_question":
+        return FALLBACK_FOLLOWUP_QUESTION
+    if request.kind == "followup":
+        _, answer = request.args
+        return f"{EMPATHY_TEMPLATES[answer]} {FALLBACK_FOLLOWUP_QUESTION}"
+    prev_question, answer, _ = request.args
+    next_question = csss_questions[csss_questions.index(prev_question) + 1]
+    return f"{EMPATHY_TEMPLATES[answer]} {fallback_question(next_question)}"
+
+def respond(request, on_text=None, deadline=None):
+    """(text, used_fallback) for a conversation.LLMRequest. With `deadline`
+    (time.monotonic()), the LLM gets only the time left and the local
+    fallback is used once it runs out; any failure also falls back."""
+    budget = None if deadline is None else deadline - time.monotonic()
+    if budget is None or budget > 0:
+        try:
+            return REQUEST_GENERATORS[request.kind](*request.args, on_text=on_text, budget=budget), False
+        except Exception as e:
+            logger.warning("Falling back to a template for %s: %s: %s", request.kind, type(e).__name__, e)
+    return fallback_message(request), True
+
+async def arespond(request):
+    """Coroutine version of respond (no streaming, no deadline) for the shared event loop."""
+    try:
+        return await ASYNC_REQUEST_GENERATORS[request.kind](*request.args), False
+    except Exception as e:
+        logger.warning("Falling back to a template for %s: %s: %s", request.kind, type(e).__name__, e)
+    return fallback_message(request), True
+
+def turn_branches(state, paraphrased_questions):
+    # Every possible next bot message for the turn on screen, as {answer: (fn, args)} for the prefetcher;
+    # with LLM_ASYNC the branches are coroutines that overlap on one event loop instead of taking a thread each
+    fn = arespond if llm_client.ASYNC_ENABLED and bank is None else respond
+    return {
+        opt: (fn, (request,))
+        for opt, request in conversation.branches(state, likert_options, csss_questions, paraphrased_questions).items()
+    }
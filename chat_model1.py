@@ -1,156 +1,121 @@
+import settings  # noqa: F401  (first: loads .env before the modules below read their settings)
 import streamlit as st
-import pandas as pd
+from streamlit.errors import StreamlitAPIException
 import uuid
-import os
 import json
+import time
 from datetime import datetime
-from openai import OpenAI
-from dotenv import load_dotenv
-import traceback
+import completions
+import prefetch
+import persistence
+import chat_render
+import conversation
+import llm_metrics
+import participation
+import session_store
 
 # ==== GOOGLE SHEETS SETUP ====
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import gsheet_store
 
-GOOGLE_SHEET_ID = "1l0dL4yBqG6wmXAB-ZNApnQUlgmybczHmTl8qAmRgYtI"
 
+@st.cache_resource
+def start_services():
+    """Process-wide setup, done on the first run only rather than on every rerun."""
+    # Write Google credentials from Streamlit secrets to file (before the worker picks its sinks)
+    if "GOOGLE_SERVICE_ACCOUNT" in st.secrets:
+        gsheet_store.write_credentials(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
 
-# Write Google credentials from Streamlit secrets to file
-if "GOOGLE_SERVICE_ACCOUNT" in st.secrets:
-    with open("csss-chatbots-6effcd218e02.json", "w") as f:
-        f.write(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
+    # Start the write-behind worker; replays any submissions left in the spool by a previous process
+    worker = persistence.get_worker()
+
+    # Prometheus text for LLM call metrics, when LLM_METRICS_PORT is set
+    llm_metrics.serve()
+    return worker
 
-def get_gsheet():
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(
-        "csss-chatbots-6effcd218e02.json", scope
-    )
-    client = gspread.authorize(creds)
-    sheet = client.open_by_key(GOOGLE_SHEET_ID).sheet1  # first worksheet
-    return sheet
 
-# def save_to_gsheet(row_dict):
-#     sheet = get_gsheet()
-#     existing = sheet.get_all_records()
-#     if not existing:  # Sheet is empty, set headers as first row
-#         sheet.insert_row(list(row_dict.keys()), 1)
-#     sheet.append_row(list(row_dict.values()))
+start_services()
 
 
+from chat_generators import (
+    csss_questions, likert_options, bank, assign_arm, paraphrase_questions,
+    respond, turn_branches, fallback_question, TURN_BUDGET_SECONDS,
+)
 
-def save_to_gsheet(row_dict):
+def rerun_turn():
+    # Clicks inside the chat fragment run as fragment reruns; fall back to a full rerun otherwise
     try:
-        st.write("🔍 Saving to Google Sheet...")
-        st.write("Row to save:", row_dict)
-
-        sheet = get_gsheet()
-        st.write("✅ Google Sheet loaded")
-
-        existing = sheet.get_all_records()
-        st.write(f"📄 Existing rows: {len(existing)}")
-
-        if not existing:
-            sheet.insert_row(list(row_dict.keys()), 1)
-            st.write("📝 Header row inserted")
-
-        sheet.append_row(list(row_dict.values()))
-        st.success("✅ Row successfully saved to Google Sheet")
-
-    except Exception as e:
-        st.error("❌ Error saving to Google Sheet")
-        st.text(traceback.format_exc())
-
-
-# --- Setup OpenAI ---
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
-
-csss_questions = [
-    "Felt anxious or distressed about personal relationships",
-    "Felt anxious or distressed about family matters",
-    "Felt anxious or distressed about financial matters",
-    "Felt anxious or distressed about academic matters",
-    "Felt anxious or distressed about housing matters",
-    "Felt anxious or distressed about being away from home",
-    "Questioned your ability to handle difficulties in your life",
-    "Questioned your ability to attain your personal goals",
-    "Felt anxious or distressed because events were not going as planned",
-    "Felt as though you were NO longer in control of your life",
-    "Felt overwhelmed by difficulties in your life"
-]
-likert_options = ["Never", "Rarely", "Sometimes", "Often", "Very Often"]
-
-def generate_question_paraphrased(question):
-    prompt = f"""
-You are a supportive chatbot helping with a stress questionnaire for college students.
-Take this stress question:
-"{question}"
-Rephrase it in a more conversational, natural, and warm way. Do not add an empathy sentence here.
-Return as a single short paragraph.
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content.strip()
-
-def generate_followup_with_empathy(question, user_answer):
-    prompt = f"""
-You are a supportive, creative chatbot for college students.
-Given the main question: "{question}"
-And the user's answer: "{user_answer}"
-Write a single message that contains:
-- First, a brief, warm, empathetic sentence acknowledging the user's answer. If the answer is positive ("Never", "Rarely"), use a positive/encouraging empathy ("I'm glad to hear this isn't a source of stress for you.", "It's good this doesn't often affect you.", etc). For "Sometimes", use a neutral empathy ("It's understandable to feel this way from time to time."). If negative ("Often", "Very Often"), be supportive/compassionate ("Dealing with this often can be very difficult to manage.", "I'm sorry to hear this is such a frequent struggle for you.", etc).
-- Then, in the same message, a varied, supportive follow-up question that is answerable on the Likert scale (Never, Rarely, Sometimes, Often, Very Often). Avoid always using "How often"; ask about impact, frequency, coping, or related feelings, but always use the Likert response style.
-Blend the empathy and the question smoothly in one message block, not as separate sentences.
-Return only the message.
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content.strip()
-
-def generate_empathy_plus_next_question(prev_question, user_answer, next_question):
-    prompt = f"""
-You are a supportive chatbot for college students. The user just answered a stress question: "{prev_question}" with "{user_answer}".
-Write a single message that:
-- Starts with a brief, warm, empathetic sentence acknowledging the user's answer (positive for "Never"/"Rarely", neutral for "Sometimes", supportive for "Often"/"Very Often").
-- Then, in the same message (new sentence), smoothly transition to the next question: "{next_question}" (make it conversational, not robotic).
-Do NOT ask for a Likert scale in the text, just present the question.
-Return only the message.
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content.strip()
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+# Session state saved after each turn, so a refresh or reconnect resumes where the participant was
+CHECKPOINT_KEYS = (
+    "page", "arm", "participant_info", "paraphrased_questions", "paraphrase_fallbacks", "conversation",
+    "chatbot_start_time", "chatbot_end_time", "chatbot_duration_seconds",
+)
+
+def save_checkpoint():
+    state = {key: st.session_state[key] for key in CHECKPOINT_KEYS}
+    state["paraphrase_fallbacks"] = sorted(state["paraphrase_fallbacks"])
+    if state["conversation"] is not None:
+        state["conversation"] = conversation.to_dict(state["conversation"])
+    for key in ("chatbot_start_time", "chatbot_end_time"):
+        if state[key] is not None:
+            state[key] = state[key].isoformat()
+    # So a session resumed in another process still reports all of its LLM usage at submit
+    state["llm_totals"] = llm_metrics.session_totals(st.session_state.session_id)
+    session_store.get_store().save(st.session_state.session_id, st.session_state.resume_token, state)
+
+def restore_checkpoint(session_id, state):
+    state["paraphrase_fallbacks"] = frozenset(state["paraphrase_fallbacks"])
+    if state["conversation"] is not None:
+        state["conversation"] = conversation.from_dict(state["conversation"])
+    for key in ("chatbot_start_time", "chatbot_end_time"):
+        if state[key] is not None:
+            state[key] = datetime.fromisoformat(state[key])
+    state["paraphrased_questions"] = [conversation.messages.intern(text) for text in state["paraphrased_questions"]]
+    if state.get("llm_totals"):
+        llm_metrics.restore_session(session_id, state["llm_totals"])
+    st.session_state.session_id = session_id
+    for key in CHECKPOINT_KEYS:
+        st.session_state[key] = state[key]
+
+def stream_into(slot, css_class="bot-msg"):
+    # Render partial bot text into a chat bubble while it is being generated
+    if not completions.STREAM_MESSAGES:
+        return None
+    return lambda text: slot.markdown(f"<div class='{css_class}'>{text}</div>", unsafe_allow_html=True)
 
 # --- Session state defaults ---
 for key, default in {
     "session_id": str(uuid.uuid4()),
     "page": "intro",
     "participant_info": {},
-    "main_step": 0,
-    "chat_history": [],
+    "arm": None,
+    "conversation": None,
     "paraphrased_questions": [],
-    "awaiting_followup": False,
-    "followup_question": "",
-    "followup_for": None,
-    "awaiting_next_with_empathy": False,
-    "next_empathy_plus_question": "",
-    "chat_answers": [],
+    "paraphrase_fallbacks": frozenset(),
     "chatbot_start_time": None,
     "chatbot_end_time": None,
     "chatbot_duration_seconds": None,
+    "resume_token": None,
+    "prefetcher": prefetch.TurnPrefetcher(enabled=prefetch.PREFETCH_ENABLED and bank is None),
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
+# A new browser session whose URL carries a resume token picks up from its checkpoint
+if st.session_state.resume_token is None and "resume" in st.query_params:
+    saved = session_store.get_store().load(st.query_params["resume"])
+    if saved is not None:
+        restore_checkpoint(*saved)
+        st.session_state.resume_token = st.query_params["resume"]
+    else:
+        del st.query_params["resume"]
+
+# Attribute this run's LLM calls (including prefetched ones) to the session
+llm_metrics.set_session(st.session_state.session_id)
+
 # --- CSS Styling ---
 st.markdown("""
     <style>
@@ -318,6 +283,8 @@ if st.session_state.page == "intro":
             st.warning("Please provide consent to continue.")
         elif not email or "@" not in email or "." not in email:
             st.warning("Please enter a valid email address to participate.")
+        elif participation.get_index().has_participated(email):
+            st.warning("This email address has already been used to take part in the study. Thank you for participating!")
         else:
             st.session_state.participant_info = {
                 "student": student,
@@ -325,6 +292,8 @@ if st.session_state.page == "intro":
                 "consent": True,
                 "email": email
             }
+            # Study arm (chatbot variant) for this participant, saved in the "model" column
+            st.session_state.arm = assign_arm()
             st.session_state.page = "chat"
             st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
@@ -333,162 +302,89 @@ if st.session_state.page == "intro":
 elif st.session_state.page == "chat":
     if st.session_state["chatbot_start_time"] is None:
         st.session_state["chatbot_start_time"] = datetime.now()
+    if st.session_state.arm is None:
+        st.session_state.arm = assign_arm()
+    if st.session_state.resume_token is None:
+        # From here on a refresh resumes this session rather than starting over
+        st.session_state.resume_token = session_store.new_token()
+        st.query_params["resume"] = st.session_state.resume_token
+        save_checkpoint()
 
     st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
     st.markdown("<div class='chat-header-title'>College Student Stress Chatbot</div>", unsafe_allow_html=True)
 
-    # Paraphrase and cache all questions up front
-    while len(st.session_state.paraphrased_questions) < len(csss_questions):
+    # Paraphrase all questions up front in this arm's wording (served from the process-wide
+    # cache when warm); anything not back within the turn budget is shown as a templated question
+    if len(st.session_state.paraphrased_questions) < len(csss_questions):
         with st.spinner("Wording question..."):
-            st.session_state.paraphrased_questions.append(
-                generate_question_paraphrased(csss_questions[len(st.session_state.paraphrased_questions)])
+            paraphrased = paraphrase_questions(st.session_state.arm, timeout=TURN_BUDGET_SECONDS)
+            # Shared with every other session showing the same wording
+            st.session_state.paraphrased_questions = [conversation.messages.intern(text) for text in paraphrased]
+            st.session_state.paraphrase_fallbacks = frozenset(
+                i for i, (q, text) in enumerate(zip(csss_questions, paraphrased)) if text == fallback_question(q)
             )
 
-    # ---- Render chat history ----
-    for entry in st.session_state.chat_history:
-        if entry["type"] in ["main_q", "empathy_plus_next_q"]:
-            st.markdown(f"<div class='bot-msg'>{entry['text']}</div>", unsafe_allow_html=True)
-        elif entry["type"] == "main_a":
-            st.markdown(f"<div class='user-msg'>{entry['text']}</div>", unsafe_allow_html=True)
-        elif entry["type"] == "followup_q":
-            st.markdown(f"<div class='bot-msg'>{entry['text']}</div>", unsafe_allow_html=True)
-        elif entry["type"] == "followup_a":
-            st.markdown(f"<div class='user-msg'>{entry['text']}</div>", unsafe_allow_html=True)
-
-    # Empathy+Next-Question block
-    if st.session_state.get("awaiting_next_with_empathy", False):
-        msg = st.session_state.next_empathy_plus_question
-        st.markdown(f"<div class='bot-msg'>{msg}</div>", unsafe_allow_html=True)
-        st.markdown('<div class="likert-row">', unsafe_allow_html=True)
-        cols = st.columns(len(likert_options))
-        for i, opt in enumerate(likert_options):
-            with cols[i]:
-                if st.button(opt, key=f"main_{st.session_state.main_step}_{opt}"):
-                    st.session_state.chat_history.append({"type": "empathy_plus_next_q", "text": msg})
-                    st.session_state.chat_history.append({"type": "main_a", "text": opt})
-
-                    # --- Save the main question and answer in chat_answers
-                    st.session_state.chat_answers.append({
-                        "question": csss_questions[st.session_state.main_step],
-                        "paraphrased": st.session_state.paraphrased_questions[st.session_state.main_step],
-                        "answer": opt,
-                        "followup": None,
-                        "followup_answer": None,
-                    })
-
-                    if opt in ["Often", "Very Often"]:
-                        followup_q = generate_followup_with_empathy(
-                            csss_questions[st.session_state.main_step], opt
+    if st.session_state.conversation is None:
+        st.session_state.conversation = conversation.new_state(
+            st.session_state.paraphrased_questions,
+            first_is_fallback=0 in st.session_state.paraphrase_fallbacks,
+            variant=st.session_state.arm,
+        )
+        save_checkpoint()
+
+    # Only this fragment reruns on a Likert click; the page chrome and CSS are not re-sent
+    @st.fragment
+    def chat_turn():
+        llm_metrics.set_session(st.session_state.session_id)  # fragment reruns skip the top of the script
+        state = st.session_state.conversation
+        # ---- Render chat history ----
+        chat_render.render_chat_history(conversation.history(state, likert_options))
+
+        # Current bot message (first question, follow-up, or empathy + next question) and the Likert answers
+        if state.phase != conversation.DONE:
+            st.markdown(f"<div class='bot-msg'>{state.prompt}</div>", unsafe_allow_html=True)
+            reply_slot = st.empty()
+            turn = conversation.turn(state)
+            st.session_state.prefetcher.start(turn, turn_branches(state, st.session_state.paraphrased_questions))
+            st.markdown('<div class="likert-row">', unsafe_allow_html=True)
+            cols = st.columns(len(likert_options))
+            for i, opt in enumerate(likert_options):
+                with cols[i]:
+                    if st.button(opt, key=f"{state.phase}_{state.step}_{opt}"):
+                        next_state, request = conversation.answer(
+                            state, opt, csss_questions, st.session_state.paraphrased_questions, likert_options,
+                            fallback_steps=st.session_state.paraphrase_fallbacks,
                         )
-                        st.session_state.followup_question = followup_q
-                        st.session_state.followup_for = st.session_state.main_step
-                        st.session_state.awaiting_followup = True
-                        st.session_state.awaiting_next_with_empathy = False
-                        st.rerun()
-                    else:
-                        if st.session_state.main_step + 1 < len(csss_questions):
-                            next_question = st.session_state.paraphrased_questions[st.session_state.main_step + 1]
-                            empathy_plus = generate_empathy_plus_next_question(
-                                csss_questions[st.session_state.main_step], opt, next_question
-                            )
-                            st.session_state.next_empathy_plus_question = empathy_plus
-                            st.session_state.main_step += 1
-                            st.rerun()
+                        if request is None:
+                            st.session_state.prefetcher.discard()
                         else:
-                            st.session_state.main_step += 1
-                            st.session_state.awaiting_next_with_empathy = False
-                            st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.stop()
-
-    # If awaiting followup, ask it
-    if st.session_state.awaiting_followup:
-        followup_q = st.session_state.followup_question
-        st.markdown(f"<div class='bot-msg'>{followup_q}</div>", unsafe_allow_html=True)
-        st.markdown('<div class="likert-row">', unsafe_allow_html=True)
-        cols = st.columns(len(likert_options))
-        for i, opt in enumerate(likert_options):
-            with cols[i]:
-                if st.button(opt, key=f"followup_{st.session_state.followup_for}_{opt}"):
-                    st.session_state.chat_history.append({"type": "followup_q", "text": followup_q})
-                    st.session_state.chat_history.append({"type": "followup_a", "text": opt})
-
-                    # --- Save the followup and answer in the last chat_answers entry
-                    if len(st.session_state.chat_answers) > 0:
-                        st.session_state.chat_answers[-1]["followup"] = followup_q
-                        st.session_state.chat_answers[-1]["followup_answer"] = opt
-
-                    st.session_state.awaiting_followup = False
-                    st.session_state.followup_question = ""
-                    st.session_state.followup_for = None
-                    st.session_state.main_step += 1
-                    if st.session_state.main_step < len(csss_questions):
-                        next_question = st.session_state.paraphrased_questions[st.session_state.main_step]
-                        empathy_plus = generate_empathy_plus_next_question(
-                            csss_questions[st.session_state.main_step - 1], opt, next_question
-                        )
-                        st.session_state.next_empathy_plus_question = empathy_plus
-                        st.session_state.awaiting_next_with_empathy = True
-                    st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.stop()
-
-    # First question
-    if st.session_state.main_step == 0 and not st.session_state.chat_history:
-        question = st.session_state.paraphrased_questions[0]
-        st.markdown(f"<div class='bot-msg'>{question}</div>", unsafe_allow_html=True)
-        st.markdown('<div class="likert-row">', unsafe_allow_html=True)
-        cols = st.columns(len(likert_options))
-        for i, opt in enumerate(likert_options):
-            with cols[i]:
-                if st.button(opt, key=f"main_0_{opt}"):
-                    st.session_state.chat_history.append({"type": "main_q", "text": question})
-                    st.session_state.chat_history.append({"type": "main_a", "text": opt})
-
-                    # --- Save the main question and answer in chat_answers
-                    st.session_state.chat_answers.append({
-                        "question": csss_questions[0],
-                        "paraphrased": st.session_state.paraphrased_questions[0],
-                        "answer": opt,
-                        "followup": None,
-                        "followup_answer": None,
-                    })
-                    if opt in ["Often", "Very Often"]:
-                        followup_q = generate_followup_with_empathy(
-                            csss_questions[0], opt
-                        )
-                        st.session_state.followup_question = followup_q
-                        st.session_state.followup_for = 0
-                        st.session_state.awaiting_followup = True
-                        st.rerun()
-                    else:
-                        if len(csss_questions) > 1:
-                            next_question = st.session_state.paraphrased_questions[1]
-                            empathy_plus = generate_empathy_plus_next_question(
-                                csss_questions[0], opt, next_question
+                            # Bounded wait: past the turn budget a templated message is shown instead
+                            deadline = time.monotonic() + TURN_BUDGET_SECONDS
+                            text, fallback = st.session_state.prefetcher.take(
+                                turn, opt, respond, request, on_text=stream_into(reply_slot),
+                                deadline=deadline, timeout=TURN_BUDGET_SECONDS
                             )
-                            st.session_state.next_empathy_plus_question = empathy_plus
-                            st.session_state.awaiting_next_with_empathy = True
-                            st.session_state.main_step = 1
-                            st.rerun()
-                        else:
-                            st.session_state.main_step = 1
-                            st.session_state.awaiting_next_with_empathy = False
-                            st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.stop()
-
-    # End of questions
-    st.markdown("<div class='bot-msg'>That's all the questions! Click below to continue.</div>", unsafe_allow_html=True)
-    if st.button("Go to Feedback Survey", use_container_width=True):
-        st.session_state["chatbot_end_time"] = datetime.now()
-        st.session_state["chatbot_duration_seconds"] = (
-            st.session_state["chatbot_end_time"] - st.session_state["chatbot_start_time"]
-        ).total_seconds()
-        st.session_state.page = "survey"
-        st.session_state._survey_scroll_fix = True
-        st.rerun()
-    st.markdown("</div>", unsafe_allow_html=True)
+                            next_state = conversation.deliver(next_state, text, fallback)
+                        st.session_state.conversation = next_state
+                        save_checkpoint()
+                        rerun_turn()
+            st.markdown('</div>', unsafe_allow_html=True)
+            return
+
+        # End of questions
+        st.markdown("<div class='bot-msg'>That's all the questions! Click below to continue.</div>", unsafe_allow_html=True)
+        if st.button("Go to Feedback Survey", use_container_width=True):
+            st.session_state["chatbot_end_time"] = datetime.now()
+            st.session_state["chatbot_duration_seconds"] = (
+                st.session_state["chatbot_end_time"] - st.session_state["chatbot_start_time"]
+            ).total_seconds()
+            st.session_state.page = "survey"
+            st.session_state._survey_scroll_fix = True
+            save_checkpoint()
+            st.rerun()
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    chat_turn()
 
 # === SURVEY PAGE ===
 elif st.session_state.page == "survey":
@@ -589,45 +485,43 @@ elif st.session_state.page == "survey":
         if missing or not open_feedback_1.strip() or not open_feedback_2.strip() or not open_feedback_3.strip():
             st.warning("Please answer all questions and fill all feedback boxes before submitting.")
         else:
+            import csss_scoring  # numpy, only needed at submit
             timestamp = datetime.now().isoformat()
+            answers = conversation.answers(
+                st.session_state.conversation, csss_questions, st.session_state.paraphrased_questions, likert_options
+            )
             row = {
                 "user_id": st.session_state.session_id,
                 "timestamp": timestamp,
                 "chatbot_duration_seconds": st.session_state.chatbot_duration_seconds,
+                **llm_metrics.session_totals(st.session_state.session_id, pop=True),
                 **st.session_state.participant_info,
-                "chatbot_conversation": json.dumps(st.session_state.chat_answers),
+                "chatbot_conversation": json.dumps(answers),
+                **csss_scoring.score_answers(answers),
                 **survey_data,
                 "What did you like most about this chatbot?": open_feedback_1,
                 "What did you find frustrating or confusing?": open_feedback_2,
                 "Do you have any suggestions to improve this chatbot?": open_feedback_3,
-                "model": "model1"
+                "model": st.session_state.arm,
             }
-            df = pd.DataFrame([row])
-            file = "csss_model1_responses_chatbot.csv"
-            if os.path.exists(file):
-                pd.concat([pd.read_csv(file), df], ignore_index=True).to_csv(file, index=False)
-            else:
-                df.to_csv(file, index=False)
-
-            # === GOOGLE SHEETS SAVE ===
-            try:
-                save_to_gsheet(row)
-            except Exception as e:
-                st.error(f"Could not save to Google Sheet: {e}")
+            # Journaled locally, then written to the CSV and Google Sheet in the background
+            persistence.get_worker().submit(row)
+            if st.session_state.participant_info.get("email"):
+                participation.get_index().record(st.session_state.participant_info["email"])
+            session_store.get_store().delete(st.session_state.session_id)
+            st.query_params.pop("resume", None)
 
             st.success("Survey submitted. Thank you!")
             st.session_state.page = "thankyou"
-            st.session_state.main_step = 0
-            st.session_state.chat_history = []
+            st.session_state.conversation = None
             st.session_state.participant_info = {}
             st.session_state.paraphrased_questions = []
-            st.session_state.awaiting_followup = False
-            st.session_state.followup_question = ""
-            st.session_state.followup_for = None
-            st.session_state.chat_answers = []
+            st.session_state.paraphrase_fallbacks = frozenset()
+            st.session_state.arm = None
             st.session_state.chatbot_start_time = None
             st.session_state.chatbot_end_time = None
             st.session_state.chatbot_duration_seconds = None
+            st.session_state.resume_token = None
             st.rerun()
 
     st.markdown('</div>', unsafe_allow_html=True)
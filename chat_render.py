@@ -0,0 +1,37 @@
+"""Chat bubble rendering for the chat_model1.py chatbot.
+
+The whole history is emitted as a single markdown element, joined on each
+render from per-message bubble fragments. The fragments are cached process-
+wide (bot messages are interned and shared by many sessions, and answers are
+one of five Likert options), so no session keeps its own copy of the
+conversation as HTML.
+"""
+from functools import lru_cache
+
+import streamlit as st
+
+BUBBLE_CLASS = {
+    "main_q": "bot-msg",
+    "empathy_plus_next_q": "bot-msg",
+    "followup_q": "bot-msg",
+    "main_a": "user-msg",
+    "followup_a": "user-msg",
+}
+
+
+@lru_cache(maxsize=4096)
+def bubble(css_class, text):
+    return f"<div class='{css_class}'>{text}</div>"
+
+
+def history_html(chat_history):
+    """HTML for `chat_history` ([{"type", "text"}])."""
+    return "\n".join(
+        bubble(BUBBLE_CLASS[entry["type"]], entry["text"]) for entry in chat_history if entry["type"] in BUBBLE_CLASS
+    )
+
+
+def render_chat_history(chat_history):
+    if not chat_history:
+        return
+    st.markdown(history_html(chat_history), unsafe_allow_html=True)
@@ -0,0 +1,361 @@
+"""Single entry point for the chatbots' chat.completions calls.
+
+Every call is routed by its call type (see llm_routes.py): the route picks the
+model, the per-call timeout, how many attempts tenacity makes on transient
+errors, and optionally a hedge delay after which a second identical request
+is raced against the first. A caller with a latency budget passes `budget`
+and gets BudgetExceeded once it runs out, whatever the upstream is doing.
+
+Requests are admitted by the process-wide llm_scheduler.py (rate limits and
+priorities; the route names the call type's priority), and identical requests
+in flight at the same time are sent once. A 429 pauses the scheduler for the
+retry-after the API asks for before tenacity tries again.
+
+`acomplete` is the non-streaming coroutine for the shared AsyncOpenAI client
+(see llm_client.py): same routing, retries, admission and metrics, without
+hedging or coalescing.
+"""
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import openai
+from tenacity import AsyncRetrying, Retrying, retry_if_exception_type, stop_after_attempt, stop_after_delay, wait_exponential
+
+import llm_metrics
+import llm_routes
+import llm_scheduler
+
+STREAM_MESSAGES = os.getenv("STREAM_MESSAGES", "1") == "1"
+STREAM_REFRESH_SECONDS = float(os.getenv("STREAM_REFRESH_SECONDS", "0.05"))
+HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", "32"))
+# Budgeted calls must not queue behind each other, or the wait eats their budget
+BUDGET_MAX_WORKERS = int(os.getenv("BUDGET_MAX_WORKERS", "128"))
+
+# Worth another attempt; anything else (bad request, auth) is raised at once
+RETRYABLE = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+class HedgeLost(Exception):
+    """Raised inside the slower of two hedged streams once the other has produced output."""
+
+
+class BudgetExceeded(TimeoutError):
+    """The call's latency budget ran out before it produced a result."""
+
+
+def get_executor(name="hedge"):
+    """Process-wide pools: "hedge" runs hedged requests, "budget" runs calls
+    with a latency budget (which may themselves hedge). Both are separate from
+    the prefetch pool, whose tasks wait on these."""
+    with _executor_lock:
+        if name not in _executors:
+            max_workers = BUDGET_MAX_WORKERS if name == "budget" else HEDGE_MAX_WORKERS
+            _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        return _executors[name]
+
+
+def _relay(updates, on_text):
+    # Show only the newest partial text queued by a worker thread
+    latest = None
+    while True:
+        try:
+            latest = updates.get_nowait()
+        except queue.Empty:
+            break
+    if latest is not None:
+        on_text(latest)
+
+
+def complete(client, model, prompt, on_text=None, call_type="other", budget=None, **kwargs):
+    """Return the stripped completion for a single-message `prompt`.
+
+    With `on_text`, the streaming API is used and `on_text(partial_text)` is
+    called as tokens arrive (throttled to STREAM_REFRESH_SECONDS); the return
+    value is the same full text the non-streaming call would give.
+
+    `model` is the generator's default; the route for `call_type` may replace
+    it. Every request is recorded in llm_metrics under `call_type`.
+
+    With `budget` (seconds), retries stop once it is spent and BudgetExceeded
+    is raised as soon as it runs out; the request itself is left to finish in
+    the background and its result is discarded.
+    """
+    route = llm_routes.get_route(call_type)
+    model = route.model or model
+    if route.timeout:
+        kwargs.setdefault("timeout", route.timeout)
+    # The caller's context (e.g. a prefetched branch) overrides the route's priority
+    token = None
+    if llm_scheduler.current_priority() is None:
+        token = llm_scheduler.set_priority(route.priority)
+    try:
+        return _complete_budgeted(client, model, prompt, on_text, call_type, route, budget, **kwargs)
+    finally:
+        if token is not None:
+            llm_scheduler.reset_priority(token)
+
+
+def _complete_budgeted(client, model, prompt, on_text, call_type, route, budget, **kwargs):
+    if budget is None:
+        return _complete_coalesced(client, model, prompt, on_text, call_type, route, None, **kwargs)
+    if budget <= 0:
+        raise BudgetExceeded(f"no time left for {call_type}")
+
+    deadline = time.monotonic() + budget
+    kwargs["timeout"] = min(kwargs.get("timeout") or budget, budget)
+    updates = queue.Queue()
+    future = get_executor("budget").submit(
+        contextvars.copy_context().run, _complete_coalesced, client, model, prompt,
+        updates.put if on_text is not None else None, call_type, route, budget, **kwargs
+    )
+    while True:
+        remaining = deadline - time.monotonic()
+        try:
+            text = future.result(timeout=max(0.0, min(remaining, STREAM_REFRESH_SECONDS) if on_text else remaining))
+        except FutureTimeout:
+            if on_text is not None:
+                _relay(updates, on_text)
+            if time.monotonic() >= deadline:
+                raise BudgetExceeded(f"{call_type} took longer than {budget:.1f}s") from None
+            continue
+        if on_text is not None:
+            _relay(updates, on_text)
+        return text
+
+
+async def acomplete(client, model, prompt, call_type="other", **kwargs):
+    """Coroutine returning the stripped completion for `prompt`, for an AsyncOpenAI `client`."""
+    route = llm_routes.get_route(call_type)
+    model = route.model or model
+    if route.timeout:
+        kwargs.setdefault("timeout", route.timeout)
+    priority = llm_scheduler.current_priority() or llm_scheduler.Priority(route.priority)
+    retrying = AsyncRetrying(
+        stop=stop_after_attempt(route.attempts),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        retry=retry_if_exception_type(RETRYABLE),
+        reraise=True,
+    )
+    async for attempt in retrying:
+        with attempt:
+            return await _acall(client, model, prompt, call_type, priority, **kwargs)
+
+
+async def _acall(client, model, prompt, call_type, priority, **kwargs):
+    scheduler = llm_scheduler.get_scheduler()
+    estimate = llm_scheduler.estimate_tokens(prompt, kwargs)
+    # acquire() blocks, so wait for a slot off the event loop
+    acquired = asyncio.get_running_loop().run_in_executor(
+        None, scheduler.acquire, priority, estimate, _seconds(kwargs.get("timeout"))
+    )
+    try:
+        await asyncio.shield(acquired)
+    except asyncio.CancelledError:
+        # acquire() carries on in its thread; hand the slot back once it is granted
+        acquired.add_done_callback(
+            lambda f: f.cancelled() or f.exception() is not None or scheduler.release(estimate)
+        )
+        raise
+    usage = None
+    start = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}], **kwargs
+        )
+        usage = response.usage
+    except Exception as e:
+        llm_metrics.record(call_type, model, time.perf_counter() - start, None, error=type(e).__name__)
+        _backoff(scheduler, e)
+        raise
+    finally:
+        scheduler.release(estimate, _total_tokens(usage))
+    llm_metrics.record(
+        call_type, model, time.perf_counter() - start, None,
+        getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None),
+    )
+    return response.choices[0].message.content.strip()
+
+
+def _seconds(timeout):
+    # Route timeouts are numbers; an httpx.Timeout object leaves admission unbounded
+    return timeout if isinstance(timeout, (int, float)) else None
+
+
+def _total_tokens(usage):
+    if usage is None or getattr(usage, "total_tokens", None) is None:
+        return None
+    return usage.total_tokens
+
+
+def _backoff(scheduler, error):
+    # Hold every request for as long as a 429 asks, instead of letting each caller rediscover the limit
+    if not isinstance(error, openai.RateLimitError):
+        return
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            seconds = float(headers["retry-after-ms"]) / 1000
+        else:
+            seconds = float(headers.get("retry-after", 1.0))
+    except ValueError:
+        seconds = 1.0
+    scheduler.backoff(min(seconds, 60.0))
+
+
+def _complete_coalesced(client, model, prompt, on_text, call_type, route, budget, **kwargs):
+    """_complete_routed, shared with any identical request already in flight.
+    A caller that joins one gets its full text at the end rather than streamed."""
+    if not llm_scheduler.coalescing():
+        return _complete_routed(client, model, prompt, on_text, call_type, route, budget, **kwargs)
+    key = llm_scheduler.request_key(model, prompt, kwargs)
+    start = time.perf_counter()
+    text, shared = llm_scheduler.get_coalescer().run(
+        key, lambda: _complete_routed(client, model, prompt, on_text, call_type, route, budget, **kwargs),
+        llm_scheduler.current_priority(),
+    )
+    if shared:
+        # No tokens or cost of its own, but this session did get an LLM message
+        llm_metrics.record(call_type, model, time.perf_counter() - start, coalesced=True)
+        if on_text is not None:
+            on_text(text)
+    return text
+
+
+def _complete_routed(client, model, prompt, on_text, call_type, route, budget, **kwargs):
+    stop = stop_after_attempt(route.attempts)
+    if budget is not None:
+        stop = stop | stop_after_delay(budget)
+    retrying = Retrying(
+        stop=stop,
+        wait=wait_exponential(multiplier=0.5, max=8),
+        retry=retry_if_exception_type(RETRYABLE),
+        reraise=True,
+    )
+    for attempt in retrying:
+        with attempt:
+            hedge_after = _hedge_delay(route, call_type, streamed=on_text is not None)
+            if hedge_after is None:
+                return _call(client, model, prompt, on_text, call_type, None, **kwargs)
+            return _hedged(client, model, prompt, on_text, call_type, hedge_after, **kwargs)
+
+
+def _hedge_delay(route, call_type, streamed):
+    if route.hedge_after == "p95":
+        return llm_metrics.latency_percentile(call_type, 95, streamed=streamed)
+    return route.hedge_after
+
+
+def _hedged(client, model, prompt, on_text, call_type, hedge_after, **kwargs):
+    """Race a second request against the first once `hedge_after` seconds pass
+    without a result (or, when streaming, without a first token). The first
+    request to produce output wins; partial text is relayed to `on_text` on
+    the calling thread, since e.g. Streamlit elements can only be updated there."""
+    lock = threading.Lock()
+    winner = []
+    updates = queue.Queue()
+
+    def submit(i):
+        def claim():
+            with lock:
+                if not winner:
+                    winner.append(i)
+                return winner[0] == i
+        return get_executor().submit(
+            contextvars.copy_context().run, _call, client, model, prompt,
+            updates.put if on_text is not None else None, call_type, claim, **kwargs
+        )
+
+    deadline = time.monotonic() + hedge_after
+    pending = {submit(0)}
+    hedged = False
+    error = None
+    while pending:
+        if not hedged:
+            timeout = max(0.0, deadline - time.monotonic())
+            if on_text is not None:
+                timeout = min(timeout, STREAM_REFRESH_SECONDS)
+        else:
+            timeout = STREAM_REFRESH_SECONDS if on_text is not None else None
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if on_text is not None:
+            _relay(updates, on_text)
+        for future in done:
+            try:
+                text = future.result()
+            except HedgeLost:
+                continue
+            except Exception as e:
+                error = error or e
+                continue
+            if on_text is not None:
+                _relay(updates, on_text)
+            return text
+        with lock:
+            waiting = not winner
+        if not hedged and pending and waiting and time.monotonic() >= deadline:
+            pending.add(submit(1))
+            hedged = True
+    raise error or HedgeLost()
+
+
+def _call(client, model, prompt, on_text, call_type, claim, **kwargs):
+    messages = [{"role": "user", "content": prompt}]
+    scheduler = llm_scheduler.get_scheduler()
+    estimate = llm_scheduler.estimate_tokens(prompt, kwargs)
+    scheduler.acquire(llm_scheduler.current_priority(), estimate, timeout=_seconds(kwargs.get("timeout")))
+    start = time.perf_counter()
+    timing = {"ttft": None, "usage": None}
+    try:
+        if on_text is None:
+            response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+            timing["usage"] = response.usage
+            text = response.choices[0].message.content.strip()
+        else:
+            text = _stream(client, model, messages, on_text, claim, start, timing, **kwargs)
+    except Exception as e:
+        llm_metrics.record(call_type, model, time.perf_counter() - start, timing["ttft"], error=type(e).__name__)
+        _backoff(scheduler, e)
+        raise
+    finally:
+        scheduler.release(estimate, _total_tokens(timing["usage"]))
+    usage = timing["usage"]
+    llm_metrics.record(
+        call_type, model, time.perf_counter() - start, timing["ttft"],
+        getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None),
+    )
+    return text
+
+
+def _stream(client, model, messages, on_text, claim, start, timing, **kwargs):
+    stream = client.chat.completions.create(
+        model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs
+    )
+    parts = []
+    last_refresh = 0.0
+    for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            timing["usage"] = chunk.usage
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        if timing["ttft"] is None:
+            timing["ttft"] = time.perf_counter() - start
+            if claim is not None and not claim():
+                getattr(stream, "close", lambda: None)()
+                raise HedgeLost()
+        parts.append(chunk.choices[0].delta.content)
+        now = time.monotonic()
+        if now - last_refresh >= STREAM_REFRESH_SECONDS:
+            on_text("".join(parts))
+            last_refresh = now
+    text = "".join(parts).strip()
+    on_text(text)
+    return text
@@ -0,0 +1,245 @@
+"""Table-driven conversation flow for both chatbot variants of the study.
+
+Each variant (arm) is one transition table in VARIANTS: "model1" answers
+every click with an LLM message (empathy + the next question, or empathy + a
+follow-up), "model1_csss" shows the next paraphrased question as-is and only
+calls the LLM for a plain follow-up question.
+
+A pure state machine with no Streamlit or OpenAI dependency. `answer(state,
+option, ...)` returns the next State together with the LLMRequest that
+produces the next bot message (None when the conversation is over); the driver
+runs the request, however it likes (directly, prefetched, batched), and hands
+the text back with `deliver`, saying whether it is a local fallback rather
+than an LLM message. chat_model1.py and loadtest/run_engine.py both drive it.
+
+The State is kept compact because one lives in every concurrent session: a
+tuple of Turn records (question index, phase, answer index, fallback flag and
+a reference to the bot message) with every message string interned in the
+process-wide `messages` table, so paraphrases, bank answers and fallback
+templates shared by many sessions are stored once. The chat history and the
+chatbot_conversation answers are derived from it on demand. `to_dict` and
+`from_dict` turn a State into plain JSON data and back (session_store.py
+checkpoints it that way).
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+MAIN, FOLLOWUP, DONE = "main", "followup", "done"
+FOLLOWUP_ANSWERS = ("Often", "Very Often")
+MODEL1, MODEL1_CSSS = "model1", "model1_csss"
+
+# kind "followup": args (question, answer)
+# kind "empathy_next": args (prev_question, answer, next_paraphrased_question)
+# kind "followup_question": args (question,)
+LLMRequest = namedtuple("LLMRequest", ["kind", "args"])
+
+# variant -> (phase, branch) -> (next phase, step increment, request kind);
+# kind None shows the next paraphrased question as-is (or ends the conversation)
+VARIANTS = {
+    MODEL1: {
+        (MAIN, "followup"): (FOLLOWUP, 0, "followup"),
+        (MAIN, "next"): (MAIN, 1, "empathy_next"),
+        (MAIN, "end"): (DONE, 1, None),
+        (FOLLOWUP, "next"): (MAIN, 1, "empathy_next"),
+        (FOLLOWUP, "end"): (DONE, 1, None),
+    },
+    MODEL1_CSSS: {
+        (MAIN, "followup"): (FOLLOWUP, 0, "followup_question"),
+        (MAIN, "next"): (MAIN, 1, None),
+        (MAIN, "end"): (DONE, 1, None),
+        (FOLLOWUP, "next"): (MAIN, 1, None),
+        (FOLLOWUP, "end"): (DONE, 1, None),
+    },
+}
+ANSWER_TYPES = {MAIN: "main_a", FOLLOWUP: "followup_a"}
+
+
+class MessageTable:
+    """Bounded, thread-safe intern table for bot message strings. Evicted
+    strings stay alive for as long as a session still refers to them."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._strings = OrderedDict()
+
+    def intern(self, text):
+        if text is None:
+            return None
+        with self._lock:
+            shared = self._strings.get(text)
+            if shared is None:
+                self._strings[text] = shared = text
+                if len(self._strings) > self.max_entries:
+                    self._strings.popitem(last=False)
+            else:
+                self._strings.move_to_end(text)
+            return shared
+
+
+messages = MessageTable()
+
+
+class Turn:
+    """One bot message and the participant's answer to it."""
+
+    __slots__ = ("step", "phase", "message", "answer", "fallback")
+
+    def __init__(self, step, phase, message, answer, fallback):
+        self.step = step          # index into the CSSS questions
+        self.phase = phase        # MAIN or FOLLOWUP
+        self.message = message    # interned bot message text
+        self.answer = answer      # index into the Likert options
+        self.fallback = fallback  # message was a local template, not the LLM's
+
+    def __repr__(self):
+        return f"Turn({self.step}, {self.phase!r}, {self.answer}, fallback={self.fallback})"
+
+
+class State:
+    """Where a session is in the conversation; treat as immutable."""
+
+    __slots__ = ("variant", "phase", "step", "prompt", "prompt_fallback", "turns")
+
+    def __init__(self, variant, phase, step, prompt, prompt_fallback, turns):
+        self.variant = variant                  # key into VARIANTS
+        self.phase = phase
+        self.step = step
+        self.prompt = prompt                    # bot message on screen, None until delivered
+        self.prompt_fallback = prompt_fallback
+        self.turns = turns                      # tuple of answered Turns
+
+    def __repr__(self):
+        return f"State({self.variant!r}, {self.phase!r}, step={self.step}, turns={len(self.turns)})"
+
+
+def new_state(paraphrased_questions, first_is_fallback=False, variant=MODEL1):
+    """State before the first answer: the first paraphrased question is on screen."""
+    if variant not in VARIANTS:
+        raise ValueError(f"unknown variant {variant!r}")
+    if not paraphrased_questions:
+        return State(variant, DONE, 0, None, False, ())
+    return State(variant, MAIN, 0, messages.intern(paraphrased_questions[0]), first_is_fallback, ())
+
+
+def turn(state):
+    """Key identifying the bot message currently on screen (e.g. for prefetch)."""
+    return (state.phase, state.step)
+
+
+def prompt_type(phase, step, first, variant=MODEL1):
+    if phase == FOLLOWUP:
+        return "followup_q"
+    if variant == MODEL1_CSSS:
+        return "main_q"
+    return "main_q" if first and step == 0 else "empathy_plus_next_q"
+
+
+def branch(state, option, questions):
+    if state.phase == MAIN and option in FOLLOWUP_ANSWERS:
+        return "followup"
+    return "next" if state.step + 1 < len(questions) else "end"
+
+
+def request_for(state, option, questions, paraphrased_questions):
+    """The LLMRequest answering `option` would issue, or None."""
+    _, _, kind = VARIANTS[state.variant][(state.phase, branch(state, option, questions))]
+    step = state.step
+    if kind == "followup":
+        return LLMRequest(kind, (questions[step], option))
+    if kind == "empathy_next":
+        return LLMRequest(kind, (questions[step], option, paraphrased_questions[step + 1]))
+    if kind == "followup_question":
+        return LLMRequest(kind, (questions[step],))
+    return None
+
+
+def branches(state, options, questions, paraphrased_questions):
+    """{option: LLMRequest} for every answer that leads to another bot message."""
+    if state.phase == DONE:
+        return {}
+    requests = {opt: request_for(state, opt, questions, paraphrased_questions) for opt in options}
+    return {opt: request for opt, request in requests.items() if request is not None}
+
+
+def answer(state, option, questions, paraphrased_questions, options, fallback_steps=()):
+    """Apply the participant's `option` (one of `options`); returns
+    (next state, LLMRequest or None).
+
+    With a request, the next state's prompt is None until `deliver` is called
+    with its result; without one, the next paraphrased question is already on
+    screen (flagged as a fallback if its step is in `fallback_steps`, the
+    questions whose paraphrase was a local template). `state` itself is not
+    modified.
+    """
+    if state.phase == DONE:
+        raise ValueError("conversation is already finished")
+    if state.prompt is None:
+        raise ValueError("no bot message delivered for this turn yet")
+    next_phase, increment, kind = VARIANTS[state.variant][(state.phase, branch(state, option, questions))]
+    answered = Turn(state.step, state.phase, state.prompt, options.index(option), state.prompt_fallback)
+    step = state.step + increment
+    prompt, prompt_fallback = None, False
+    if kind is None and next_phase != DONE:
+        prompt, prompt_fallback = messages.intern(paraphrased_questions[step]), step in fallback_steps
+    next_state = State(state.variant, next_phase, step, prompt, prompt_fallback, state.turns + (answered,))
+    return next_state, request_for(state, option, questions, paraphrased_questions)
+
+
+def deliver(state, text, fallback=False):
+    """State with the bot message `text` on screen; `fallback` marks a local
+    templated message used instead of the LLM's."""
+    return State(state.variant, state.phase, state.step, messages.intern(text), fallback, state.turns)
+
+
+def history(state, options):
+    """Chat history as [{"type", "text"}], bot message then answer per turn."""
+    entries = []
+    for i, t in enumerate(state.turns):
+        entries.append({"type": prompt_type(t.phase, t.step, first=i == 0, variant=state.variant), "text": t.message})
+        entries.append({"type": ANSWER_TYPES[t.phase], "text": options[t.answer]})
+    return entries
+
+
+def answers(state, questions, paraphrased_questions, options):
+    """The saved chatbot_conversation: one entry per CSSS question answered."""
+    entries = []
+    for t in state.turns:
+        if t.phase == MAIN:
+            entries.append({
+                "question": questions[t.step],
+                "paraphrased": paraphrased_questions[t.step],
+                "answer": options[t.answer],
+                "followup": None,
+                "followup_answer": None,
+                "fallback": t.fallback,
+                "followup_fallback": False,
+            })
+        elif entries:
+            entries[-1].update(followup=t.message, followup_answer=options[t.answer], followup_fallback=t.fallback)
+    return entries
+
+
+def to_dict(state):
+    """`state` as JSON-serializable data, for checkpointing."""
+    return {
+        "variant": state.variant,
+        "phase": state.phase,
+        "step": state.step,
+        "prompt": state.prompt,
+        "prompt_fallback": state.prompt_fallback,
+        "turns": [[t.step, t.phase, t.message, t.answer, t.fallback] for t in state.turns],
+    }
+
+
+def from_dict(data):
+    """The State saved by `to_dict`, its messages interned again."""
+    if data["variant"] not in VARIANTS:
+        raise ValueError(f"unknown variant {data['variant']!r}")
+    turns = tuple(
+        Turn(step, phase, messages.intern(message), answer, fallback)
+        for step, phase, message, answer, fallback in data["turns"]
+    )
+    return State(
+        data["variant"], data["phase"], data["step"], messages.intern(data["prompt"]), data["prompt_fallback"], turns
+    )
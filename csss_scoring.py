@@ -0,0 +1,117 @@
+"""CSSS scoring for chatbot conversations, one at a time or in bulk.
+
+Each of the 11 College Student Stress Scale items is scored from its Likert
+answer (Never=1 ... Very Often=5), so a complete conversation totals 11-55.
+Subscales split the items into external stressors (relationships, family,
+money, academics, housing, being away from home) and perceived control
+(questioning one's ability, plans going wrong, losing control, being
+overwhelmed). Follow-up answers, asked after "Often"/"Very Often", are scored
+on the same scale and summed separately; they are not CSSS items.
+
+Both paths share `score_matrix`, which works on a participants x items array:
+`score_answers` scores one chatbot_conversation at submit time, and
+`score_turns` scores a whole turns table (see ingest_responses.py) without
+any per-row Python.
+
+    python csss_scoring.py --analytics analytics --out csss_scores.parquet
+"""
+import argparse
+
+import numpy as np
+
+LIKERT_OPTIONS = ("Never", "Rarely", "Sometimes", "Often", "Very Often")
+LIKERT_SCORES = {option: score for score, option in enumerate(LIKERT_OPTIONS, start=1)}
+N_ITEMS = 11
+SUBSCALES = {
+    "csss_stressors": np.arange(0, 6),
+    "csss_control": np.arange(6, 11),
+}
+SCORE_COLUMNS = ("csss_total", *SUBSCALES, "csss_items_answered", "csss_followup_total", "csss_followups")
+
+
+def score_matrix(items, followups=None):
+    """Score columns for an (n, N_ITEMS) array of item scores, 0 where an
+    item was not answered; `followups` has the same shape for follow-ups."""
+    items = np.asarray(items, dtype=np.int16)
+    scores = {"csss_total": items.sum(axis=1)}
+    for name, columns in SUBSCALES.items():
+        scores[name] = items[:, columns].sum(axis=1)
+    scores["csss_items_answered"] = (items > 0).sum(axis=1)
+    followups = np.zeros_like(items) if followups is None else np.asarray(followups, dtype=np.int16)
+    scores["csss_followup_total"] = followups.sum(axis=1)
+    scores["csss_followups"] = (followups > 0).sum(axis=1)
+    return scores
+
+
+def score_answers(entries):
+    """Score columns for one conversation, as saved in chatbot_conversation
+    (conversation.answers): plain ints, ready to go into the submitted row."""
+    items = np.zeros((1, N_ITEMS), dtype=np.int16)
+    followups = np.zeros((1, N_ITEMS), dtype=np.int16)
+    for i, entry in enumerate(entries[:N_ITEMS]):
+        items[0, i] = LIKERT_SCORES.get(entry.get("answer"), 0)
+        followups[0, i] = LIKERT_SCORES.get(entry.get("followup_answer"), 0)
+    return {name: int(values[0]) for name, values in score_matrix(items, followups).items()}
+
+
+def _codes(answers):
+    # Likert strings -> 1..5, 0 for missing or unknown, without a Python loop
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    positions = pc.fill_null(pc.index_in(answers, value_set=pa.array(LIKERT_OPTIONS)), -1)
+    return positions.to_numpy().astype(np.int16) + 1
+
+
+def score_turns(turns):
+    """Scores per participant from a turns table (pyarrow Table or pandas
+    DataFrame with user_id, question_index, answer, followup_answer), as a
+    DataFrame indexed by user_id."""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(turns, pd.DataFrame):
+        turns = pa.Table.from_pandas(turns[["user_id", "question_index", "answer", "followup_answer"]])
+    if turns.num_rows == 0:
+        # e.g. a --model that matches no partition
+        return pd.DataFrame(columns=list(SCORE_COLUMNS), index=pd.Index([], name="user_id"), dtype="int64")
+    turns = turns.combine_chunks()
+    user_ids = pc.dictionary_encode(turns["user_id"]).chunk(0)
+    participants = user_ids.indices.to_numpy()
+    question = turns["question_index"].to_numpy()
+    keep = (question >= 0) & (question < N_ITEMS)
+    rows, question = participants[keep], question[keep]
+    items = np.zeros((len(user_ids.dictionary), N_ITEMS), dtype=np.int16)
+    followups = np.zeros_like(items)
+    items[rows, question] = _codes(turns["answer"])[keep]
+    followups[rows, question] = _codes(turns["followup_answer"])[keep]
+    index = pd.Index(user_ids.dictionary.to_pandas(), name="user_id")
+    return pd.DataFrame(score_matrix(items, followups), index=index)
+
+
+def main(argv=None):
+    import time
+
+    import ingest_responses
+
+    parser = argparse.ArgumentParser(description="Rescore every ingested conversation.")
+    parser.add_argument("--analytics", default=ingest_responses.OUTPUT_DIR, help="output of ingest_responses.py")
+    parser.add_argument("--model", help="only this model's partitions")
+    parser.add_argument("--out", help="write the scores to this Parquet file")
+    args = parser.parse_args(argv)
+    turns = ingest_responses.read(
+        args.analytics, "turns", ["user_id", "question_index", "answer", "followup_answer"], model=args.model
+    )
+    start = time.perf_counter()
+    scores = score_turns(turns)
+    elapsed = time.perf_counter() - start
+    print(f"{len(scores)} participants scored in {elapsed * 1000:.1f} ms")
+    if len(scores):
+        print(scores.describe().loc[["mean", "min", "max"]].round(2).to_string())
+    if args.out:
+        scores.reset_index().to_parquet(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Google Sheets sink for submitted survey rows.
+
+The authorized client and worksheet are created once per process; the
+underlying google-auth session refreshes the service-account token itself.
+gspread and oauth2client are imported on first use, since only a submit
+needs them.
+The header row is checked once per process by reading row 1 only, and
+widened in place when rows bring new columns.
+"""
+import os
+import threading
+
+GOOGLE_SHEET_ID = "1l0dL4yBqG6wmXAB-ZNApnQUlgmybczHmTl8qAmRgYtI"
+CREDENTIALS_FILE = "csss-chatbots-6effcd218e02.json"
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+_lock = threading.Lock()
+_sheet = None
+_header = None
+
+
+def write_credentials(content):
+    """Write the service-account JSON to CREDENTIALS_FILE unless it already holds it."""
+    if os.path.exists(CREDENTIALS_FILE):
+        with open(CREDENTIALS_FILE) as f:
+            if f.read() == content:
+                return
+    with open(CREDENTIALS_FILE, "w") as f:
+        f.write(content)
+
+
+def get_gsheet():
+    global _sheet
+    with _lock:
+        if _sheet is None:
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+
+            creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPE)
+            client = gspread.authorize(creds)
+            _sheet = client.open_by_key(GOOGLE_SHEET_ID).sheet1  # first worksheet
+        return _sheet
+
+
+def reset_gsheet():
+    """Forget the cached worksheet and header, e.g. after an auth or API error."""
+    global _sheet, _header
+    with _lock:
+        _sheet = None
+        _header = None
+
+
+def ensure_header(sheet, columns):
+    """Header row of the sheet, inserting `columns` first if the sheet is empty
+    and appending any of `columns` it does not have yet."""
+    global _header
+    with _lock:
+        if _header is None:
+            _header = sheet.row_values(1)
+            if not _header:
+                sheet.insert_row(list(columns), 1)
+                _header = list(columns)
+        missing = [col for col in columns if col not in _header]
+        if missing:
+            sheet.update(range_name="A1", values=[_header + missing])
+            _header = _header + missing
+        return _header
+
+
+def append_rows(rows):
+    """Append row dicts in one request, ordered by the sheet's header."""
+    if not rows:
+        return
+    try:
+        sheet = get_gsheet()
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        header = ensure_header(sheet, columns)
+        sheet.append_rows([[row.get(col, "") for col in header] for row in rows])
+    except Exception:
+        reset_gsheet()
+        raise
+
+
+def append_row(row):
+    append_rows([row])
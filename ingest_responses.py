@@ -0,0 +1,223 @@
+"""Incremental ingestion of the responses CSV into partitioned Parquet.
+
+Each run reads only the bytes appended to csss_model1_responses_chatbot.csv
+since the last checkpoint, and writes two hive-partitioned Parquet tables
+(date=YYYY-MM-DD/model=...) under the output directory:
+
+    responses/  one row per submission, typed, without the email column
+    turns/      one row per CSSS question answered in the chatbot, flattened
+                from chatbot_conversation: question_index, question,
+                paraphrased, answer, followup, followup_answer, fallback flags
+
+Parquet files are named after the number of rows ingested before them, so a
+run that dies before its checkpoint is saved rewrites the same files next
+time. If responses_store.py has rewritten the CSV to widen its header, the
+byte offset no longer applies and the rows already ingested are skipped by
+count instead.
+
+    python ingest_responses.py --out analytics
+    python -c "import ingest_responses as r; print(r.read('analytics', 'turns', ['answer'], model='model1').num_rows)"
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import csss_scoring
+import responses_store
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; reads may then see a row being appended
+    fcntl = None
+
+OUTPUT_DIR = os.getenv("ANALYTICS_DIR", "analytics")
+CHECKPOINT_FILE = "_checkpoint.json"
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("model", pa.string())]), flavor="hive")
+
+# Column types for the responses table; anything not listed is kept as a string
+RESPONSE_TYPES = {
+    "timestamp": pa.timestamp("us"),
+    "chatbot_duration_seconds": pa.float64(),
+    "llm_calls": pa.int64(),
+    "llm_coalesced": pa.int64(),
+    "llm_seconds": pa.float64(),
+    "llm_prompt_tokens": pa.int64(),
+    "llm_completion_tokens": pa.int64(),
+    "llm_cost_usd": pa.float64(),
+    "age": pa.int64(),
+    "consent": pa.bool_(),
+    **{column: pa.int64() for column in csss_scoring.SCORE_COLUMNS},
+}
+DROPPED_COLUMNS = ("email", "chatbot_conversation")  # email is never part of the research dataset
+
+TURN_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("question_index", pa.int16()),
+    ("question", pa.string()),
+    ("paraphrased", pa.string()),
+    ("answer", pa.string()),
+    ("followup", pa.string()),
+    ("followup_answer", pa.string()),
+    ("fallback", pa.bool_()),
+    ("followup_fallback", pa.bool_()),
+    ("date", pa.string()),
+    ("model", pa.string()),
+])
+
+
+def load_checkpoint(out_dir):
+    try:
+        with open(os.path.join(out_dir, CHECKPOINT_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"offset": 0, "rows": 0, "header": None}
+
+
+def save_checkpoint(out_dir, checkpoint):
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def read_new_rows(csv_path, checkpoint):
+    """(header, rows added since `checkpoint`, new checkpoint)."""
+    with open(csv_path, "rb") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_SH)  # responses_store appends under LOCK_EX
+        try:
+            header_line = f.readline()
+            header = next(csv.reader([header_line.decode("utf-8")]), [])
+            if header == checkpoint["header"]:
+                f.seek(max(checkpoint["offset"], len(header_line)))
+                skip = 0
+            else:
+                # First run, or the CSV was rewritten with a wider header: same rows, same order
+                skip = checkpoint["rows"]
+            start = f.tell()
+            data = f.read()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""), fieldnames=header))[skip:]
+    return header, rows, {"offset": start + len(data), "rows": checkpoint["rows"] + len(rows), "header": header}
+
+
+def _parse_value(text, type_):
+    if text is None or text == "":
+        return None
+    if type_ == pa.timestamp("us"):
+        return datetime.fromisoformat(text)
+    if type_ == pa.bool_():
+        return text.strip().lower() in ("true", "1", "yes")
+    if type_ == pa.int64():
+        return int(float(text))
+    if type_ == pa.float64():
+        return float(text)
+    return text
+
+
+def _partition_values(row):
+    return (row.get("timestamp") or "")[:10] or "unknown", row.get("model") or "unknown"
+
+
+def responses_table(header, rows):
+    columns = [col for col in header if col not in DROPPED_COLUMNS and col != "model"]
+    arrays, fields = [], []
+    for col in columns:
+        type_ = RESPONSE_TYPES.get(col, pa.string())
+        arrays.append(pa.array([_parse_value(row.get(col), type_) for row in rows], type=type_))
+        fields.append(pa.field(col, type_))
+    partitions = [_partition_values(row) for row in rows]
+    arrays += [pa.array([d for d, _ in partitions], pa.string()), pa.array([m for _, m in partitions], pa.string())]
+    fields += [pa.field("date", pa.string()), pa.field("model", pa.string())]
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def turns_table(rows):
+    columns = {field.name: [] for field in TURN_SCHEMA}
+    for row in rows:
+        try:
+            entries = json.loads(row.get("chatbot_conversation") or "[]")
+        except ValueError:
+            continue
+        timestamp = _parse_value(row.get("timestamp"), pa.timestamp("us"))
+        date, model = _partition_values(row)
+        for i, entry in enumerate(entries):
+            columns["user_id"].append(row.get("user_id"))
+            columns["timestamp"].append(timestamp)
+            columns["question_index"].append(i)
+            for key in ("question", "paraphrased", "answer", "followup", "followup_answer"):
+                columns[key].append(entry.get(key))
+            # Submissions from before the latency budget have no fallback flags
+            columns["fallback"].append(bool(entry.get("fallback", False)))
+            columns["followup_fallback"].append(bool(entry.get("followup_fallback", False)))
+            columns["date"].append(date)
+            columns["model"].append(model)
+    return pa.table(columns, schema=TURN_SCHEMA)
+
+
+def write_table(table, out_dir, name, batch):
+    if table.num_rows == 0:
+        return
+    ds.write_dataset(
+        table, os.path.join(out_dir, name), format="parquet", partitioning=PARTITIONING,
+        basename_template=f"part-{batch:09d}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def ingest(csv_path=responses_store.RESPONSES_FILE, out_dir=OUTPUT_DIR):
+    """Append the CSV rows added since the last run to both tables; returns
+    (responses ingested, turns ingested)."""
+    if not os.path.exists(csv_path):
+        return 0, 0
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint = load_checkpoint(out_dir)
+    header, rows, new_checkpoint = read_new_rows(csv_path, checkpoint)
+    responses = responses_table(header, rows)
+    turns = turns_table(rows)
+    write_table(responses, out_dir, "responses", checkpoint["rows"])
+    write_table(turns, out_dir, "turns", checkpoint["rows"])
+    save_checkpoint(out_dir, new_checkpoint)
+    return responses.num_rows, turns.num_rows
+
+
+def dataset(out_dir, name):
+    """The `name` table as a pyarrow dataset. Files written before a column
+    was added read as null for it."""
+    root = os.path.join(out_dir, name)
+    files = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    schema = pa.unify_schemas([fragment.physical_schema for fragment in files.get_fragments()] + [PARTITIONING.schema])
+    return ds.dataset(root, schema=schema, format="parquet", partitioning=PARTITIONING)
+
+
+def read(out_dir, name, columns=None, date=None, model=None):
+    """Read only `columns` of the partitions matching `date` / `model`."""
+    condition = None
+    for field, value in (("date", date), ("model", model)):
+        if value is not None:
+            term = pc.field(field) == value
+            condition = term if condition is None else condition & term
+    return dataset(out_dir, name).to_table(columns=columns, filter=condition)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest new survey responses into partitioned Parquet.")
+    parser.add_argument("--csv", default=responses_store.RESPONSES_FILE, help="responses CSV to read")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="directory for the Parquet tables and checkpoint")
+    args = parser.parse_args(argv)
+    responses, turns = ingest(args.csv, args.out)
+    print(f"{args.out}: {responses} new responses, {turns} new turns")
+
+
+if __name__ == "__main__":
+    main()
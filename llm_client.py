@@ -0,0 +1,87 @@
+"""Process-wide OpenAI clients shared by every chatbot session.
+
+`get_client()` is one OpenAI client whose httpx pool keeps TLS connections
+alive between calls, so a bot turn does not pay connection setup. Streamlit
+re-executes the page scripts on every click, but this module stays imported,
+so the client (and its pool) outlives reruns. Retries are left to
+completions.py, per route.
+
+`get_async_client()` is the AsyncOpenAI counterpart, bound to one event loop
+running on a daemon thread. `submit(coro)` schedules a coroutine on that loop
+from any thread and returns a concurrent.futures.Future, so the synchronous
+app code (e.g. prefetch.py) can overlap many requests without a thread each.
+With LLM_ASYNC=1 the prefetched turn branches take that path. It is off by
+default: httpcore's async pool rescans every queued request against every
+connection, so a burst of ~100 branches on reused connections was several
+times slower than the prefetch thread pool in loadtest/run_load.py.
+
+Pool limits: LLM_MAX_CONNECTIONS (total, per client), LLM_MAX_KEEPALIVE
+(idle connections kept open) and LLM_KEEPALIVE_SECONDS.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+ASYNC_ENABLED = os.getenv("LLM_ASYNC", "0") == "1"
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "1000"))
+MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "200"))
+# httpx drops idle connections after 5s by default, shorter than the gap between most clicks
+KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "30"))
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_loop = None
+
+
+def limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE,
+        keepalive_expiry=KEEPALIVE_SECONDS,
+    )
+
+
+def get_client():
+    """The shared synchronous client (API key and base URL from the environment)."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = OpenAI(max_retries=0, http_client=DefaultHttpxClient(limits=limits()))
+        return _client
+
+
+def get_async_client():
+    """The shared AsyncOpenAI client; only await it on `get_loop()`."""
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = AsyncOpenAI(max_retries=0, http_client=DefaultAsyncHttpxClient(limits=limits()))
+        return _async_client
+
+
+def get_loop():
+    """The event loop the async client runs on, started on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-async", daemon=True).start()
+        return _loop
+
+
+async def _in_context(context, coro):
+    # Tasks start from the loop thread's context; carry the caller's over (e.g. the llm_metrics session)
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def submit(coro):
+    """Run `coro` on the shared loop; returns a concurrent.futures.Future.
+    Cancelling the future cancels the coroutine, in-flight request included."""
+    return asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coro), get_loop())
@@ -0,0 +1,287 @@
+"""Latency, token and cost instrumentation for every chat.completions call.
+
+completions.complete records one entry per call: wall time, time to first
+token (streamed calls), prompt/completion tokens, model, call type
+(paraphrase / followup / empathy_next) and the session it was made for. Each
+entry is folded into in-process aggregates, which are exposed as Prometheus
+text (on LLM_METRICS_PORT when set) and as per-session totals that
+chat_model1.py stores in the saved row, and is queued for a background thread
+that appends it to METRICS_FILE as a JSON line, so no call waits on the file.
+
+A request that joined an identical one already in flight (see
+llm_scheduler.Coalescer) is recorded with `coalesced` set and no tokens or
+cost: for its session it counts as an LLM call (llm_calls) and in
+llm_coalesced, so the tokens and cost stay with the session that sent it; in
+the per-call-type totals it counts only as coalesced, not as a call upstream.
+
+The session is taken from a context variable set once per script run with
+`set_session`; prefetch threads inherit it through contextvars.copy_context().
+
+    python llm_metrics.py summary [llm_metrics.jsonl]   # per call type / model table
+    python llm_metrics.py prometheus [llm_metrics.jsonl]
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_FILE = os.getenv("LLM_METRICS_FILE", "llm_metrics.jsonl")
+METRICS_PORT = os.getenv("LLM_METRICS_PORT")
+MAX_SESSIONS = 10000
+RECENT_CALLS = 200  # per call type, for latency_percentile
+
+# USD per 1M (prompt, completion) tokens
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+_session = contextvars.ContextVar("llm_session", default=None)
+_lock = threading.Lock()
+_totals = {}  # (call_type, model) -> aggregate
+_sessions = OrderedDict()  # session_id -> aggregate, oldest evicted first
+_recent = {}  # (call_type, "seconds" | "ttft_seconds") -> deque of recent successful latencies
+_pending = queue.Queue()  # JSON lines for METRICS_FILE
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def set_session(session_id):
+    """Attribute calls made from this context (and contexts copied from it) to `session_id`."""
+    _session.set(session_id)
+
+
+def cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return ((prompt_tokens or 0) * prompt_price + (completion_tokens or 0) * completion_price) / 1e6
+
+
+def _empty():
+    return {"calls": 0, "coalesced": 0, "seconds": 0.0, "ttft_seconds": 0.0, "ttft_calls": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(aggregate, entry):
+    if entry.get("coalesced"):
+        aggregate["coalesced"] += 1
+    aggregate["calls"] += 1
+    aggregate["seconds"] += entry["seconds"]
+    if entry.get("ttft_seconds") is not None:
+        aggregate["ttft_seconds"] += entry["ttft_seconds"]
+        aggregate["ttft_calls"] += 1
+    aggregate["prompt_tokens"] += entry.get("prompt_tokens") or 0
+    aggregate["completion_tokens"] += entry.get("completion_tokens") or 0
+    aggregate["cost_usd"] += entry.get("cost_usd") or 0.0
+
+
+def _add_upstream(aggregate, entry):
+    # Per call type / model totals: a coalesced entry was not a request of its own
+    if entry.get("coalesced"):
+        aggregate["coalesced"] += 1
+    else:
+        _add(aggregate, entry)
+
+
+def _write_lines():
+    while True:
+        lines = [_pending.get()]
+        while True:
+            try:
+                lines.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        except OSError:
+            pass  # metrics must never break a chat turn
+        finally:
+            for _ in lines:
+                _pending.task_done()
+
+
+def _write(entry):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_lines, name="llm-metrics-writer", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+    _pending.put(json.dumps(entry) + "\n")
+
+
+def flush():
+    """Block until every recorded entry has been appended to METRICS_FILE."""
+    _pending.join()
+
+
+def record(call_type, model, seconds, ttft_seconds=None, prompt_tokens=None, completion_tokens=None, error=None,
+           coalesced=False):
+    entry = {
+        "ts": round(time.time(), 3),
+        "session_id": _session.get(),
+        "call_type": call_type,
+        "model": model,
+        "seconds": round(seconds, 4),
+        "ttft_seconds": round(ttft_seconds, 4) if ttft_seconds is not None else None,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": round(cost(model, prompt_tokens, completion_tokens), 6),
+    }
+    if error is not None:
+        entry["error"] = error
+    if coalesced:
+        entry["coalesced"] = True
+    with _lock:
+        _add_upstream(_totals.setdefault((call_type, model), _empty()), entry)
+        if error is None and not coalesced:
+            for field in ("seconds", "ttft_seconds"):
+                if entry[field] is not None:
+                    _recent.setdefault((call_type, field), deque(maxlen=RECENT_CALLS)).append(entry[field])
+        if entry["session_id"] is not None:
+            aggregate = _sessions.pop(entry["session_id"], None) or _empty()
+            _add(aggregate, entry)
+            _sessions[entry["session_id"]] = aggregate
+            while len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+    if METRICS_FILE:
+        _write(entry)
+    return entry
+
+
+def latency_percentile(call_type, pct, streamed=False, min_samples=20):
+    """`pct`th percentile of recent successful call times (time to first token
+    when `streamed`), or None until `min_samples` calls have been seen."""
+    with _lock:
+        values = sorted(_recent.get((call_type, "ttft_seconds" if streamed else "seconds"), ()))
+    if len(values) < min_samples:
+        return None
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def session_totals(session_id, pop=False):
+    """Columns for the saved row: this session's LLM calls, time, tokens and cost."""
+    with _lock:
+        aggregate = (_sessions.pop(session_id, None) if pop else _sessions.get(session_id)) or _empty()
+    return {
+        "llm_calls": aggregate["calls"],
+        "llm_coalesced": aggregate["coalesced"],
+        "llm_seconds": round(aggregate["seconds"], 3),
+        "llm_prompt_tokens": aggregate["prompt_tokens"],
+        "llm_completion_tokens": aggregate["completion_tokens"],
+        "llm_cost_usd": round(aggregate["cost_usd"], 6),
+    }
+
+
+def restore_session(session_id, totals):
+    """Seed this session's aggregate from session_totals() saved by another
+    process (a resumed checkpoint), unless this process already has one."""
+    with _lock:
+        if session_id in _sessions:
+            return
+        aggregate = _empty()
+        aggregate.update(
+            calls=totals["llm_calls"], coalesced=totals.get("llm_coalesced", 0), seconds=totals["llm_seconds"],
+            prompt_tokens=totals["llm_prompt_tokens"], completion_tokens=totals["llm_completion_tokens"],
+            cost_usd=totals["llm_cost_usd"],
+        )
+        _sessions[session_id] = aggregate
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+
+
+def _aggregate_file(path):
+    totals = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            _add_upstream(totals.setdefault((entry["call_type"], entry["model"]), _empty()), entry)
+    return totals
+
+
+def prometheus_text(totals=None):
+    """Aggregates in the Prometheus text exposition format."""
+    if totals is None:
+        with _lock:
+            totals = {key: dict(value) for key, value in _totals.items()}
+    metrics = [
+        ("llm_calls_total", "counter", "LLM calls", "calls"),
+        ("llm_coalesced_total", "counter", "Requests served by an identical call already in flight", "coalesced"),
+        ("llm_call_seconds_sum", "counter", "Total wall time of LLM calls", "seconds"),
+        ("llm_ttft_seconds_sum", "counter", "Total time to first token of streamed LLM calls", "ttft_seconds"),
+        ("llm_ttft_calls_total", "counter", "Streamed LLM calls", "ttft_calls"),
+        ("llm_prompt_tokens_total", "counter", "Prompt tokens", "prompt_tokens"),
+        ("llm_completion_tokens_total", "counter", "Completion tokens", "completion_tokens"),
+        ("llm_cost_usd_total", "counter", "Estimated cost in USD", "cost_usd"),
+    ]
+    lines = []
+    for name, kind, help_text, field in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (call_type, model), aggregate in sorted(totals.items()):
+            lines.append(f'{name}{{call_type="{call_type}",model="{model}"}} {aggregate[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def summary_text(totals):
+    lines = [f"{'call type':<14} {'model':<14} {'calls':>7} {'shared':>7} {'mean s':>8} {'ttft s':>8} "
+             f"{'prompt tok':>11} {'compl tok':>10} {'cost $':>9}"]
+    for (call_type, model), a in sorted(totals.items(), key=lambda item: -item[1]["seconds"]):
+        mean = f"{a['seconds'] / a['calls']:.3f}" if a["calls"] else "-"
+        ttft = f"{a['ttft_seconds'] / a['ttft_calls']:.3f}" if a["ttft_calls"] else "-"
+        lines.append(f"{call_type:<14} {model:<14} {a['calls']:>7} {a['coalesced']:>7} {mean:>8} {ttft:>8} "
+                     f"{a['prompt_tokens']:>11} {a['completion_tokens']:>10} {a['cost_usd']:>9.4f}")
+    return "\n".join(lines)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+
+
+def serve(port=METRICS_PORT):
+    """Expose prometheus_text() over HTTP on `port`, once per process; no-op without a port."""
+    global _server
+    with _lock:
+        if _server is None and port:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="llm-metrics", daemon=True).start()
+        return _server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a LLM metrics file.")
+    parser.add_argument("format", choices=["summary", "prometheus"])
+    parser.add_argument("path", nargs="?", default=METRICS_FILE)
+    args = parser.parse_args(argv)
+    totals = _aggregate_file(args.path)
+    if args.format == "summary":
+        print(summary_text(totals))
+    else:
+        sys.stdout.write(prometheus_text(totals))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Per-call-type routing for the chatbots' LLM calls.
+
+Each call type (paraphrase, paraphrase_batch, followup, empathy_next) gets a
+Route: the model to use (None keeps the generator's own default), a per-call
+timeout, how many attempts tenacity makes on transient errors, an optional
+hedge delay after which completions.complete fires a second, identical
+request and keeps whichever answers first, and the priority llm_scheduler.py
+admits it at when rate limits bind. `hedge_after` is a number of seconds, or
+"p95" to hedge once a call is slower than the recent 95th percentile for its
+call type (see llm_metrics.latency_percentile).
+
+Override the defaults with LLM_ROUTES, either inline JSON or a path to a JSON
+file, keyed by call type ("default" applies to all of them):
+
+    LLM_ROUTES='{"empathy_next": {"model": "gpt-4o-mini", "hedge_after": "p95"}, "default": {"timeout": 20}}'
+
+A misspelled setting or a bad value raises ValueError at import.
+"""
+import json
+import os
+
+import llm_scheduler
+
+DEFAULT_ROUTES = {
+    "default": {"model": None, "timeout": 30.0, "attempts": 3, "hedge_after": None, "priority": "background"},
+    # A participant is waiting on these
+    "followup": {"priority": "interactive"},
+    "empathy_next": {"priority": "interactive"},
+    "paraphrase": {"priority": "warmup"},
+    "paraphrase_batch": {"priority": "warmup"},
+}
+
+
+FIELDS = ("model", "timeout", "attempts", "hedge_after", "priority")
+
+
+class Route:
+    def __init__(self, model=None, timeout=30.0, attempts=3, hedge_after=None, priority="background"):
+        self.model = model
+        self.timeout = timeout
+        self.attempts = attempts
+        self.hedge_after = hedge_after
+        self.priority = priority
+
+    def __repr__(self):
+        return (f"Route(model={self.model!r}, timeout={self.timeout!r}, "
+                f"attempts={self.attempts!r}, hedge_after={self.hedge_after!r}, priority={self.priority!r})")
+
+
+def load_routes(spec=None):
+    """{call_type: settings} from DEFAULT_ROUTES overlaid with `spec` (JSON text or a file path)."""
+    routes = {name: dict(settings) for name, settings in DEFAULT_ROUTES.items()}
+    if spec:
+        if os.path.exists(spec):
+            with open(spec, encoding="utf-8") as f:
+                spec = f.read()
+        for name, settings in json.loads(spec).items():
+            routes.setdefault(name, {}).update(settings)
+    for name, settings in routes.items():
+        validate(name, settings)
+    return routes
+
+
+def validate(name, settings):
+    """Raise ValueError for a misspelled setting or a bad value, rather than
+    failing every call of that type later (and silently serving templates)."""
+    unknown = set(settings) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"LLM route {name!r}: unknown setting(s) {sorted(unknown)}; expected {list(FIELDS)}")
+    hedge_after = settings.get("hedge_after")
+    if hedge_after is not None and hedge_after != "p95" and not isinstance(hedge_after, (int, float)):
+        raise ValueError(f"LLM route {name!r}: hedge_after must be seconds or \"p95\", not {hedge_after!r}")
+    if "priority" in settings and settings["priority"] not in llm_scheduler.PRIORITIES:
+        raise ValueError(
+            f"LLM route {name!r}: priority must be one of {list(llm_scheduler.PRIORITIES)}, not {settings['priority']!r}"
+        )
+
+
+ROUTES = load_routes(os.getenv("LLM_ROUTES"))
+
+
+def model_for(call_type, default):
+    """The model `call_type` calls are sent to, when the generator's own is `default`."""
+    return get_route(call_type).model or default
+
+
+def get_route(call_type, routes=None):
+    routes = ROUTES if routes is None else routes
+    settings = dict(routes.get("default", {}))
+    settings.update(routes.get(call_type, {}))
+    return Route(**settings)
@@ -0,0 +1,264 @@
+"""Process-wide admission control for the chatbots' chat.completions calls.
+
+Every request completions.py sends first acquires a slot from the shared
+Scheduler: token buckets for requests and tokens per minute (LLM_RPM,
+LLM_TPM), an optional cap on requests in flight (LLM_MAX_IN_FLIGHT), and a
+pause after a 429 for as long as the API's retry-after asks. When the limits
+bind, waiting requests are admitted by priority, then arrival:
+
+    interactive  a bot turn the participant is waiting on
+    prefetch     speculative branches (raised to interactive once chosen)
+    warmup       question paraphrasing
+    background   offline work such as building the response bank
+
+The priority of a call comes from its route (llm_routes.py) unless the
+caller's context carries a Priority (see set_priority), which prefetch.py
+uses so a branch can be promoted while it is queued. Identical requests in
+flight at the same time are sent once and share the result (Coalescer).
+Limits of 0 mean unlimited.
+"""
+import contextvars
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+INTERACTIVE, PREFETCH, WARMUP, BACKGROUND = 0, 1, 2, 3
+PRIORITIES = {"interactive": INTERACTIVE, "prefetch": PREFETCH, "warmup": WARMUP, "background": BACKGROUND}
+
+RPM = float(os.getenv("LLM_RPM", "0"))
+TPM = float(os.getenv("LLM_TPM", "0"))
+MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "0"))
+# Completion tokens charged up front; corrected from the reported usage afterwards
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "200"))
+
+
+class SchedulerTimeout(TimeoutError):
+    """No slot was granted before the call's timeout."""
+
+
+class TokenBucket:
+    """Refills at `per_minute` / 60 per second, holding at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # An amount larger than the bucket can hold waits for a full bucket
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+
+class Priority:
+    """Mutable priority of one logical call; raising it re-ranks the call if it is queued."""
+
+    __slots__ = ("level",)
+
+    def __init__(self, level):
+        self.level = PRIORITIES.get(level, level)
+
+    def raise_to(self, level):
+        level = PRIORITIES.get(level, level)
+        if level < self.level:
+            self.level = level
+            get_scheduler().notify()
+
+
+_priority = contextvars.ContextVar("llm_priority", default=None)
+
+
+def set_priority(priority):
+    """Run this context's LLM calls at `priority` (a Priority or level name), whatever their route says."""
+    return _priority.set(priority if isinstance(priority, Priority) or priority is None else Priority(priority))
+
+
+def reset_priority(token):
+    _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+_coalescing = contextvars.ContextVar("llm_coalescing", default=True)
+
+
+def set_coalescing(enabled):
+    """Turn coalescing off for this context, e.g. when identical prompts are sampled for distinct variants."""
+    return _coalescing.set(enabled)
+
+
+def coalescing():
+    return _coalescing.get()
+
+
+def estimate_tokens(prompt, kwargs):
+    return len(prompt) // 4 + int(kwargs.get("max_tokens") or EXPECTED_COMPLETION_TOKENS)
+
+
+class Scheduler:
+    def __init__(self, rpm=RPM, tpm=TPM, max_in_flight=MAX_IN_FLIGHT):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.stats = Counter()
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+
+    @property
+    def limited(self):
+        return bool(self.requests or self.tokens or self.max_in_flight)
+
+    def _wait_time(self, ticket, now):
+        # Seconds until `ticket` may go, or None to wait for a notify (a request is ahead of it)
+        if self.paused_until > now:
+            return self.paused_until - now
+        if min(self._waiting, key=lambda t: (t[0].level, t[1])) is not ticket:
+            return None
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return None
+        waits = [0.0]
+        for bucket, amount in ((self.requests, 1), (self.tokens, ticket[2])):
+            if bucket is not None:
+                bucket.refill(now)
+                waits.append(bucket.wait_time(amount))
+        return max(waits)
+
+    def acquire(self, priority, tokens, timeout=None):
+        """Block until a request of about `tokens` tokens may be sent; pair
+        with release(). Raises SchedulerTimeout after `timeout` seconds."""
+        priority = priority or Priority(INTERACTIVE)
+        ticket = (priority, next(self._seq), tokens)
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            if not self.limited and self.paused_until <= start:
+                self.in_flight += 1
+                self.stats["granted"] += 1
+                return
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(ticket, now)
+                    if wait == 0.0:
+                        break
+                    if deadline is not None:
+                        if now >= deadline:
+                            self.stats["timeouts"] += 1
+                            raise SchedulerTimeout(f"no LLM slot within {timeout:.1f}s")
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket is not None:
+                    bucket.level -= amount
+            self.in_flight += 1
+            self.stats["granted"] += 1
+            self.stats["wait_seconds"] += time.monotonic() - start
+
+    def release(self, estimated_tokens, actual_tokens=None):
+        """Free the slot; `actual_tokens` corrects the token bucket's estimate."""
+        with self._cond:
+            self.in_flight -= 1
+            if self.tokens is not None and actual_tokens is not None:
+                self.tokens.level -= actual_tokens - estimated_tokens
+            self._cond.notify_all()
+
+    def backoff(self, seconds):
+        """Hold every request for `seconds`, e.g. after a 429."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.stats["backoffs"] += 1
+
+    def notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+class Coalescer:
+    """Runs one call per key at a time; identical concurrent calls share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.shared = 0
+
+    def run(self, key, fn, priority=None):
+        """(fn() or the in-flight call's result for `key`, whether it was shared).
+        A caller joining at a higher `priority` raises the in-flight call's to it."""
+        with self._lock:
+            leader = key not in self._inflight
+            if leader:
+                self._inflight[key] = (Future(), priority)
+            else:
+                self.shared += 1
+            future, leader_priority = self._inflight[key]
+        if not leader:
+            if priority is not None and leader_priority is not None:
+                leader_priority.raise_to(priority.level)
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+def request_key(model, prompt, kwargs):
+    # Transport settings do not change the completion
+    settings = {k: v for k, v in kwargs.items() if k not in ("timeout", "stream", "stream_options")}
+    raw = json.dumps([model, prompt, settings], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+_lock = threading.Lock()
+_scheduler = None
+_coalescer = None
+
+
+def get_scheduler():
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def get_coalescer():
+    global _coalescer
+    with _lock:
+        if _coalescer is None:
+            _coalescer = Coalescer()
+        return _coalescer
+
+
+def stats():
+    """Counters for reports: granted, timeouts, backoffs, wait_seconds, coalesced."""
+    scheduler = get_scheduler()
+    with scheduler._cond:
+        counters = dict(scheduler.stats)
+    counters["coalesced"] = get_coalescer().shared
+    return counters
@@ -0,0 +1,206 @@
+"""Push synthetic participants through the conversation engine, without Streamlit.
+
+Each participant is assigned a study arm (STUDY_ARMS weights, as in the app)
+and answers the 11 CSSS questions (and any follow-ups) with random Likert
+options, driving conversation.py exactly as chat_model1.py does and
+fulfilling its LLM requests with the real generators in chat_generators.py.
+Participants run in parallel on a thread pool against the local OpenAI
+stand-in (or --base-url). The report gives LLM calls, token usage and
+templated fallbacks per session (from llm_metrics), request kinds and branch
+frequencies, and what llm_scheduler.py did (waits, 429 backoffs, coalesced
+requests), optionally as JSON.
+
+    python loadtest/run_engine.py --participants 2000 --workers 64
+    python loadtest/run_engine.py --weights 1 1 1 2 2 --json engine.json
+    LLM_RPM=3000 python loadtest/run_engine.py --stub-rpm 3000 --participants 300
+
+Set RESPONSE_BANK_PATH to measure serving from a pre-generated bank instead.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, HERE)
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("LLM_METRICS_FILE", "")  # totals are taken in-process
+
+import chat_generators  # noqa: E402
+import conversation  # noqa: E402
+import llm_client  # noqa: E402
+import llm_metrics  # noqa: E402
+import llm_scheduler  # noqa: E402
+import stub_openai  # noqa: E402
+from chat_generators import csss_questions, likert_options  # noqa: E402
+
+
+def run_participant(seed, paraphrased_by_arm, weights, budget):
+    rng = random.Random(seed)
+    counters = Counter()
+    branches = Counter()
+    session_id = f"participant-{seed}"
+    llm_metrics.set_session(session_id)
+    arm = chat_generators.assign_arm(rng)
+    paraphrased = paraphrased_by_arm[arm]
+    counters[f"arm:{arm}"] += 1
+    state = conversation.new_state(paraphrased, variant=arm)
+    start = time.perf_counter()
+    while state.phase != conversation.DONE:
+        option = rng.choices(likert_options, weights)[0]
+        branches[f"{state.phase}->{conversation.branch(state, option, csss_questions)}"] += 1
+        state, request = conversation.answer(state, option, csss_questions, paraphrased, likert_options)
+        if request is not None:
+            counters[f"request:{request.kind}"] += 1
+            text, fallback = chat_generators.respond(request, deadline=time.monotonic() + budget)
+            counters["fallbacks"] += fallback
+            state = conversation.deliver(state, text, fallback)
+    llm_metrics.set_session(None)
+    counters.update(llm_metrics.session_totals(session_id, pop=True))
+    return {
+        "seconds": time.perf_counter() - start,
+        "turns": len(state.turns),
+        "followups": sum(1 for t in state.turns if t.phase == conversation.FOLLOWUP),
+        "counters": counters,
+        "branches": branches,
+    }
+
+
+def distribution(values):
+    if not values:
+        return None
+    return {"mean": statistics.fmean(values), "p50": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def summarize(results, errors, elapsed, shared):
+    counters, branches = Counter(), Counter()
+    for result in results:
+        counters.update(result["counters"])
+        branches.update(result["branches"])
+    done = len(results)
+    turns = sum(branches.values())
+    return {
+        "participants": done + len(errors),
+        "completed": done,
+        "errors": errors[:10],
+        "elapsed_seconds": elapsed,
+        "sessions_per_second": done / elapsed if elapsed else None,
+        "shared_paraphrase": dict(shared),
+        "per_session": {
+            "llm_calls": distribution([r["counters"]["llm_calls"] for r in results]),
+            "llm_seconds": distribution([r["counters"]["llm_seconds"] for r in results]),
+            "prompt_tokens": distribution([r["counters"]["llm_prompt_tokens"] for r in results]),
+            "completion_tokens": distribution([r["counters"]["llm_completion_tokens"] for r in results]),
+            "cost_usd": distribution([r["counters"]["llm_cost_usd"] for r in results]),
+            "turns": distribution([r["turns"] for r in results]),
+            "followups": distribution([r["followups"] for r in results]),
+            "fallbacks": distribution([r["counters"]["fallbacks"] for r in results]),
+            "seconds": distribution([r["seconds"] for r in results]),
+        },
+        "arms": {k.split(":", 1)[1]: v for k, v in sorted(counters.items()) if k.startswith("arm:")},
+        "requests": {k.split(":", 1)[1]: v for k, v in sorted(counters.items()) if k.startswith("request:")},
+        "branch_frequencies": {k: v / turns for k, v in sorted(branches.items())} if turns else {},
+    }
+
+
+def print_report(report):
+    print(f"participants: {report['completed']}/{report['participants']} completed in {report['elapsed_seconds']:.1f}s "
+          f"({report['sessions_per_second']:.1f} sessions/s)")
+    shared = report["shared_paraphrase"]
+    print(f"paraphrase:   {shared['llm_calls']} shared call(s), "
+          f"{shared['llm_prompt_tokens']} + {shared['llm_completion_tokens']} tokens")
+    print(f"{'per session':<18} {'mean':>9} {'p50':>9} {'min':>9} {'max':>9}")
+    for name, d in report["per_session"].items():
+        if d is not None:
+            print(f"{name:<18} {d['mean']:>9.3f} {d['p50']:>9.3f} {d['min']:>9.3f} {d['max']:>9.3f}")
+    for arm, count in report["arms"].items():
+        print(f"arm {arm:<16} {count}")
+    for kind, count in report["requests"].items():
+        print(f"requests {kind:<12} {count}")
+    for name, share in report["branch_frequencies"].items():
+        print(f"branch {name:<20} {share:6.1%}")
+    scheduler = report["scheduler"]
+    print(f"scheduler:    {scheduler.get('granted', 0)} granted, {scheduler.get('wait_seconds', 0.0):.1f}s waited, "
+          f"{scheduler.get('timeouts', 0)} timed out, {scheduler.get('backoffs', 0)} backoff(s), "
+          f"{scheduler.get('coalesced', 0)} coalesced")
+    if report["rejected"] is not None:
+        print(f"stub 429s:    {report['rejected']}")
+    for error in report["errors"]:
+        print(f"error: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless synthetic participants for the conversation engine.")
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=64, help="participants in flight at once")
+    parser.add_argument("--weights", type=float, nargs=len(likert_options), default=[1] * len(likert_options),
+                        metavar="W", help="relative frequency of each Likert answer, Never..Very Often")
+    parser.add_argument("--base-url", help="use an already running OpenAI-compatible server")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub first-token latency (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="stub per-token delay (s)")
+    parser.add_argument("--tokens", type=int, default=40, help="stub words per completion")
+    parser.add_argument("--stub-rpm", type=int, default=0, help="stub answers 429 beyond this many requests a minute")
+    parser.add_argument("--budget", type=float, default=chat_generators.TURN_BUDGET_SECONDS,
+                        help="per-turn latency budget (s) before the templated fallback is used")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = stub_openai.start_stub(
+            config=stub_openai.StubConfig(args.latency, args.token_delay, args.tokens, args.stub_rpm)
+        )
+    chat_generators.client = llm_client.get_client().with_options(base_url=base_url)  # same connection pool
+    logging.getLogger("chat_generators").setLevel(logging.ERROR)  # fallbacks are counted in the report
+
+    try:
+        # The app paraphrases once per process (paraphrase_cache), so it is counted separately
+        llm_metrics.set_session("paraphrase")
+        paraphrased = {
+            arm: [spec["generate"](q) for q in csss_questions] for arm, spec in chat_generators.ARMS.items()
+            if arm in chat_generators.ARM_WEIGHTS
+        }
+        llm_metrics.set_session(None)
+        shared = llm_metrics.session_totals("paraphrase", pop=True)
+
+        results, errors = [], []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="participant") as pool:
+            futures = [
+                pool.submit(run_participant, args.seed * 100003 + i, paraphrased, args.weights, args.budget)
+                for i in range(args.participants)
+            ]
+            for i, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors.append(f"participant {i}: {type(e).__name__}: {e}")
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = summarize(results, errors, elapsed, shared)
+    report["scheduler"] = llm_scheduler.stats()
+    report["rejected"] = server.config.rejected if server is not None else None
+    report["config"] = vars(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Drive many simulated participants through one chat_model1.py process.
+
+Starts `streamlit run chat_model1.py` headless against the local OpenAI
+stand-in in stub_openai.py, then opens one websocket session per participant
+and speaks Streamlit's own protocol, exactly as a browser tab would: intro ->
+11 questions with random Likert answers -> survey submit. Reports per-step
+latency percentiles, throughput, and the server process's memory and CPU per
+session, optionally as JSON for regression tracking.
+
+    python loadtest/run_load.py --participants 100 --concurrency 50 --latency 0.8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+import stub_openai  # noqa: E402
+
+LIKERT = ["Never", "Rarely", "Sometimes", "Often", "Very Often"]
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+class HeadlessSession:
+    """One browser-tab-equivalent Streamlit session over the websocket protocol."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.ws = None
+        self.page_hash = ""
+        self.widgets = {}  # widget id -> WidgetState the "browser" currently holds
+        self.elements = []  # (fragment id or "", element) currently on screen
+
+    async def connect(self):
+        self.ws = await websocket_connect(self.url, max_message_size=64 * 1024 * 1024)
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    async def rerun(self, trigger=None):
+        """Rerun the script (optionally clicking button `trigger`) and wait for it to settle."""
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.widget_states.widgets.extend(self.widgets.values())
+        if trigger is not None:
+            msg.rerun_script.widget_states.widgets.append(WidgetState(id=trigger.id, trigger_value=True))
+            # Like the browser, a click inside an st.fragment only reruns that fragment
+            msg.rerun_script.fragment_id = self._fragment_of(trigger)
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        await asyncio.wait_for(self._read_until_finished(), self.timeout)
+
+    async def _read_until_finished(self):
+        while True:
+            raw = await self.ws.read_message()
+            if raw is None:
+                raise ConnectionError("server closed the session")
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "new_session":
+                self.page_hash = fwd.new_session.page_script_hash
+                rerun = set(fwd.new_session.fragment_ids_this_run)
+                self.elements = [(f, e) for f, e in self.elements if rerun and f not in rerun]
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                if element.WhichOneof("type") == "exception":
+                    raise RuntimeError(f"app exception: {element.exception.message}")
+                self.elements.append((fwd.delta.fragment_id, element))
+            elif kind == "script_finished":
+                if fwd.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("app failed to compile")
+                if fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    def _fragment_of(self, widget):
+        for fragment_id, element in self.elements:
+            if element.WhichOneof("type") == "button" and element.button.id == widget.id:
+                return fragment_id
+        return ""
+
+    def find(self, kind, label=None):
+        found = []
+        for _, element in self.elements:
+            if element.WhichOneof("type") == kind:
+                widget = getattr(element, kind)
+                if label is None or widget.label == label:
+                    found.append(widget)
+        return found
+
+    def text(self):
+        return "\n".join(e.markdown.body for _, e in self.elements if e.WhichOneof("type") == "markdown")
+
+    def set_value(self, widget, **value):
+        self.widgets[widget.id] = WidgetState(id=widget.id, **value)
+
+
+async def run_participant(url, seed, timeout, think_time):
+    rng = random.Random(seed)
+    timings = []
+    session = HeadlessSession(url, timeout)
+
+    async def step(kind, trigger=None):
+        start = time.perf_counter()
+        await session.rerun(trigger)
+        timings.append((kind, time.perf_counter() - start))
+
+    await session.connect()
+    try:
+        await step("load")
+        session.set_value(session.find("text_input")[0], string_value=f"participant{seed}@example.edu")
+        session.set_value(session.find("checkbox")[0], bool_value=True)
+        await step("start", session.find("button", "Start Chatbot")[0])
+
+        turns = 0
+        while True:
+            options = [b for b in session.find("button") if b.label in LIKERT]
+            if not options:
+                break
+            await asyncio.sleep(rng.uniform(*think_time))  # reading time before the click
+            await step("turn", rng.choice(options))
+            turns += 1
+
+        to_survey = session.find("button", "Go to Feedback Survey")
+        if not to_survey:
+            raise RuntimeError("chat did not reach the end of the questions")
+        await step("to_survey", to_survey[0])
+
+        for radio in session.find("radio"):
+            session.set_value(radio, int_value=rng.randrange(len(radio.options)))
+        for area in session.find("text_area"):
+            session.set_value(area, string_value="Simulated feedback.")
+        await step("submit", session.find("button", "Submit Survey")[0])
+        if "Thank You!" not in session.text():
+            raise RuntimeError("survey was not accepted")
+        return {"timings": timings, "turns": turns}
+    finally:
+        session.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(app_path, port, workdir, env):
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", app_path,
+        "--server.headless", "true",
+        "--server.port", str(port),
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+    ]
+    log = open(os.path.join(workdir, "streamlit.log"), "w")
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited early, see {log.name}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("streamlit did not become healthy")
+
+
+def proc_rss(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def proc_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+async def drive(url, args, pid):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results, errors = [], []
+    peak = {"rss": proc_rss(pid)}
+
+    async def one(i):
+        async with semaphore:
+            try:
+                results.append(await run_participant(url, args.seed * 100003 + i, args.timeout, args.think_time))
+            except Exception as e:
+                errors.append(f"participant {i}: {type(e).__name__}: {e}")
+
+    async def sample_memory():
+        while True:
+            peak["rss"] = max(peak["rss"], proc_rss(pid))
+            await asyncio.sleep(0.25)
+
+    sampler = asyncio.ensure_future(sample_memory())
+    try:
+        await asyncio.gather(*(one(i) for i in range(args.participants)))
+    finally:
+        sampler.cancel()
+    return results, errors, peak["rss"]
+
+
+def summarize(results, errors, elapsed, rss_base, rss_peak, cpu_seconds, concurrency, llm_requests, llm_connections):
+    by_kind = {}
+    for result in results:
+        for kind, seconds in result["timings"]:
+            by_kind.setdefault(kind, []).append(seconds)
+    done = len(results)
+    turns = sum(r["turns"] for r in results)
+    return {
+        "participants": done + len(errors),
+        "completed": done,
+        "errors": errors[:10],
+        "elapsed_seconds": elapsed,
+        "participants_per_minute": done / elapsed * 60 if elapsed else None,
+        "turns_per_second": turns / elapsed if elapsed else None,
+        "llm_requests": llm_requests,
+        "llm_connections": llm_connections,
+        "latency_seconds": {
+            kind: {
+                "count": len(values),
+                "mean": statistics.fmean(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": max(values),
+            }
+            for kind, values in by_kind.items()
+        },
+        "server_rss_peak_bytes": rss_peak,
+        "server_rss_per_session_bytes": (rss_peak - rss_base) / max(1, min(concurrency, done + len(errors))),
+        "server_cpu_seconds": cpu_seconds,
+        "server_cpu_ms_per_turn": cpu_seconds / turns * 1000 if turns else None,
+    }
+
+
+def print_report(report):
+    print(f"participants: {report['completed']}/{report['participants']} completed in {report['elapsed_seconds']:.1f}s")
+    print(f"throughput:   {report['participants_per_minute']:.1f} participants/min, {report['turns_per_second']:.2f} turns/s")
+    if report["llm_requests"] is not None:
+        print(f"LLM requests: {report['llm_requests']} over {report['llm_connections']} connections")
+    print(f"{'step':<10} {'count':>6} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for kind, s in report["latency_seconds"].items():
+        print(f"{kind:<10} {s['count']:>6} {s['mean']:>8.3f} {s['p50']:>8.3f} {s['p90']:>8.3f} {s['p99']:>8.3f} {s['max']:>8.3f}")
+    print(f"server memory: {report['server_rss_peak_bytes'] / 2**20:.1f} MiB peak, "
+          f"{report['server_rss_per_session_bytes'] / 1024:.1f} KiB per concurrent session")
+    if report["server_cpu_ms_per_turn"] is not None:
+        print(f"server CPU:    {report['server_cpu_seconds']:.1f}s total, {report['server_cpu_ms_per_turn']:.1f} ms per turn")
+    for error in report["errors"]:
+        print(f"error: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-participant load test for chat_model1.py.")
+    parser.add_argument("--participants", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--app", default=os.path.join(REPO_ROOT, "chat_model1.py"))
+    parser.add_argument("--base-url", help="use an already running OpenAI-compatible server")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub first-token latency (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub per-token delay (s)")
+    parser.add_argument("--tokens", type=int, default=40, help="stub words per completion")
+    parser.add_argument("--think-time", type=float, nargs=2, default=(0.5, 2.0), metavar=("MIN", "MAX"),
+                        help="seconds a participant reads before each click")
+    parser.add_argument("--timeout", type=float, default=120, help="per-step timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = stub_openai.start_stub(
+            config=stub_openai.StubConfig(args.latency, args.token_delay, args.tokens)
+        )
+
+    # Scratch directory so responses, spool and cache files stay out of the repo
+    workdir = tempfile.mkdtemp(prefix="csss-load-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write('LOAD_TEST = "1"\n')
+    env = dict(os.environ, OPENAI_BASE_URL=base_url, PARAPHRASE_CACHE_DIR=os.path.join(workdir, "paraphrase_cache"))
+    env.setdefault("OPENAI_API_KEY", "stub")
+
+    port = free_port()
+    app = start_app(os.path.abspath(args.app), port, workdir, env)
+    try:
+        rss_base = proc_rss(app.pid)
+        cpu_base = proc_cpu_seconds(app.pid)
+        start = time.perf_counter()
+        results, errors, rss_peak = asyncio.run(drive(f"ws://127.0.0.1:{port}/_stcore/stream", args, app.pid))
+        elapsed = time.perf_counter() - start
+        cpu_seconds = proc_cpu_seconds(app.pid) - cpu_base
+    finally:
+        app.terminate()
+        app.wait(timeout=30)
+        if server is not None:
+            server.shutdown()
+
+    report = summarize(
+        results, errors, elapsed, rss_base, rss_peak, cpu_seconds, args.concurrency,
+        server.config.requests if server else None, server.config.connections if server else None,
+    )
+    report["config"] = vars(args)
+    report["workdir"] = workdir
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
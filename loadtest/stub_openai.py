@@ -0,0 +1,181 @@
+"""Local OpenAI-compatible stand-in for load tests.
+
+Serves POST /v1/chat/completions (plain, streaming and JSON mode) with a
+configurable first-token latency, per-token delay and completion length, so
+the chatbot can be driven at volume without touching the real API. With
+--rpm it answers 429 (with retry-after) beyond that many requests in any
+60 seconds, like the real API's rate limit.
+
+    python loadtest/stub_openai.py --port 8765 --latency 0.8 --tokens 60
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub streamlit run chat_model1.py
+"""
+import argparse
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "It sounds like this has been on your mind lately and that is completely understandable "
+    "thank you for sharing how often have you felt this way over the past month"
+).split()
+
+
+class StubConfig:
+    def __init__(self, latency=0.5, token_delay=0.01, tokens=40, rpm=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.rpm = rpm
+        self.requests = 0
+        self.rejected = 0  # answered 429
+        self.connections = 0  # TCP connections accepted; fewer than requests means keep-alive reuse
+        self.accepted = deque()  # times of the requests served in the last 60s, when rpm is set
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """0 if a request may be served now, else the seconds until one may."""
+        if not self.rpm:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            while self.accepted and now - self.accepted[0] >= 60:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.rpm:
+                self.rejected += 1
+                return 60 - (now - self.accepted[0])
+            self.accepted.append(now)
+            return 0
+
+
+def _completion_text(body, config, n):
+    prompt = body["messages"][-1]["content"]
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        count = len(re.findall(r'^\d+\. "', prompt, flags=re.M))
+        items = [{"index": i, "text": f"Stub paraphrase {i} ({n})."} for i in range(1, count + 1)]
+        return json.dumps({"items": items})
+    return " ".join(WORDS[i % len(WORDS)] for i in range(config.tokens)).capitalize() + f" ({n})."
+
+
+def make_handler(config):
+    counter = itertools.count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            with config.lock:
+                config.connections += 1
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            retry_after = config.admit()
+            if retry_after:
+                data = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}).encode()
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("retry-after-ms", str(int(retry_after * 1000)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            n = next(counter)
+            with config.lock:
+                config.requests += 1
+            text = _completion_text(body, config, n)
+            prompt_tokens = len(body["messages"][-1]["content"].split())
+            completion_tokens = len(text.split())
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            time.sleep(config.latency)
+
+            if not body.get("stream"):
+                time.sleep(config.token_delay * completion_tokens)
+                self._send_json(200, {
+                    "id": f"stub-{n}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            base = {"id": f"stub-{n}", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "stub")}
+            for i, word in enumerate(text.split(" ")):
+                chunk = dict(base, choices=[{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}])
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(config.token_delay)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self.wfile.write(f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default listen backlog of 5 refuses bursts of concurrent clients
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (timeouts, budgets, lost hedges); only report real errors
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_stub(port=0, config=None):
+    """Start the stub on a background thread; returns (server, base_url)."""
+    config = config or StubConfig()
+    server = StubServer(("127.0.0.1", port), make_handler(config))
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for load tests.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds per generated token")
+    parser.add_argument("--tokens", type=int, default=40, help="words per completion")
+    parser.add_argument("--rpm", type=int, default=0, help="answer 429 beyond this many requests a minute")
+    args = parser.parse_args(argv)
+    server, base_url = start_stub(args.port, StubConfig(args.latency, args.token_delay, args.tokens, args.rpm))
+    print(f"Stub OpenAI listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Process-wide paraphrase cache shared by every chatbot session.
+
+Entries are keyed by (question text, prompt template, model) and hold a small
+pool of paraphrase variants. Until the pool is full each lookup generates one
+more variant; after that lookups are served round-robin from the pool without
+calling the LLM. Entries live in an in-memory LRU and in a JSON file per key on
+disk, so a restarted process starts warm. Both tiers honour the TTL.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+CACHE_DIR = os.getenv("PARAPHRASE_CACHE_DIR", ".paraphrase_cache")
+POOL_SIZE = int(os.getenv("PARAPHRASE_POOL_SIZE", "3"))
+TTL_SECONDS = float(os.getenv("PARAPHRASE_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("PARAPHRASE_CACHE_MAX_ENTRIES", "256"))
+# Process-wide bound on paraphrase calls running off the caller's thread, whatever the number of sessions
+MAX_WORKERS = int(os.getenv("PARAPHRASE_MAX_WORKERS", "32"))
+BATCH_TIMEOUT_SECONDS = float(os.getenv("PARAPHRASE_BATCH_TIMEOUT_SECONDS", "60"))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool for every session's paraphrase calls: get_many's and
+    get_batch's cache misses and batch_paraphrase's per-item fallbacks."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="paraphrase")
+        return _executor
+
+
+def cache_key(question, template, model):
+    raw = json.dumps([question, template, model], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ParaphraseCache:
+    def __init__(self, directory=CACHE_DIR, pool_size=POOL_SIZE, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.pool_size = max(1, pool_size)
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- disk tier ---
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, entry):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in entry.items() if k != "cursor"}, f, ensure_ascii=False)
+        os.replace(tmp, self._path(key))
+
+    def _remove(self, key):
+        self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    # --- memory tier ---
+    def _expired(self, entry):
+        return self.ttl > 0 and time.time() - entry["created"] > self.ttl
+
+    def _entry(self, key):
+        # Caller holds self._lock.
+        entry = self._memory.get(key)
+        if entry is None and self.directory:
+            entry = self._load(key)
+            if entry is not None:
+                entry["cursor"] = 0
+                self._memory[key] = entry
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+            return None
+        if entry is not None:
+            self._memory.move_to_end(key)
+        return entry
+
+    def _evict(self):
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _cached(self, key):
+        # Caller holds self._lock. Next pooled variant, or None while the pool is filling.
+        entry = self._entry(key)
+        if entry is None or len(entry["variants"]) < self.pool_size:
+            return None
+        variants = entry["variants"]
+        text = variants[entry["cursor"] % len(variants)]
+        entry["cursor"] += 1
+        return text
+
+    def _add(self, key, question, model, text):
+        # Caller holds self._lock.
+        entry = self._entry(key)
+        if entry is None:
+            entry = {
+                "question": question,
+                "model": model,
+                "created": time.time(),
+                "variants": [],
+                "cursor": 0,
+            }
+            self._memory[key] = entry
+        # Concurrent misses may share one coalesced request (llm_scheduler); keep variants distinct
+        if len(entry["variants"]) < self.pool_size and text not in entry["variants"]:
+            entry["variants"].append(text)
+            self._store(key, entry)
+        self._evict()
+
+    # --- public API ---
+    def get(self, question, template, model, generate):
+        """Return a paraphrase of `question`, calling `generate(question)` only
+        while the variant pool for this key is not yet full."""
+        key = cache_key(question, template, model)
+        with self._lock:
+            text = self._cached(key)
+        if text is not None:
+            return text
+
+        text = generate(question)
+        with self._lock:
+            self._add(key, question, model, text)
+        return text
+
+    def get_many(self, questions, template, model, generate, timeout=BATCH_TIMEOUT_SECONDS, fallback=None):
+        """Paraphrase all `questions` concurrently, preserving their order.
+
+        Warm keys are served on the calling thread; each miss is generated on
+        the shared pool (get_executor). A question whose call fails or is not
+        finished after `timeout` seconds falls back to `fallback(question)`
+        (default: its original text); a late result still lands in the cache.
+        """
+        keys = [cache_key(q, template, model) for q in questions]
+        with self._lock:
+            results = [self._cached(key) for key in keys]
+        futures = {
+            i: get_executor().submit(self.get, questions[i], template, model, generate)
+            for i, text in enumerate(results) if text is None
+        }
+        if not futures:
+            return results
+        wait(futures.values(), timeout=timeout)
+        for i, future in futures.items():
+            if future.done() and future.exception() is None:
+                results[i] = future.result()
+            else:
+                results[i] = fallback(questions[i]) if fallback else questions[i]
+        return results
+
+    def get_batch(self, questions, template, model, generate_batch, timeout=None, fallback=None):
+        """Like get_many, but all cache misses go to `generate_batch(questions)`
+        in one call, which must return one text per question in order. If that
+        call fails or takes longer than `timeout` seconds, the misses fall back
+        to `fallback(question)` (default: the original text); a late result
+        still lands in the cache."""
+        keys = [cache_key(q, template, model) for q in questions]
+        with self._lock:
+            results = [self._cached(key) for key in keys]
+        missing = [i for i, text in enumerate(results) if text is None]
+        if not missing:
+            return results
+
+        def store(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            with self._lock:
+                for i, text in zip(missing, future.result()):
+                    self._add(keys[i], questions[i], model, text)
+
+        future = get_executor().submit(generate_batch, [questions[i] for i in missing])
+        future.add_done_callback(store)
+        wait([future], timeout=timeout)
+        texts = future.result() if future.done() and future.exception() is None else None
+        for n, i in enumerate(missing):
+            if texts is not None:
+                results[i] = texts[n]
+            else:
+                results[i] = fallback(questions[i]) if fallback else questions[i]
+        return results
+
+    def peek(self, question, template, model):
+        """Cached variants for a key, without generating anything."""
+        with self._lock:
+            entry = self._entry(cache_key(question, template, model))
+            return list(entry["variants"]) if entry else []
+
+    def rotate(self, question, template, model):
+        """Drop the oldest variant so the next lookup generates a fresh one."""
+        key = cache_key(question, template, model)
+        with self._lock:
+            entry = self._entry(key)
+            if entry and entry["variants"]:
+                entry["variants"].pop(0)
+                entry["cursor"] = 0
+                self._store(key, entry)
+
+    def invalidate(self, question, template, model):
+        with self._lock:
+            self._remove(cache_key(question, template, model))
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._memory):
+                self._remove(key)
+            if self.directory and os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name.endswith(".json"):
+                        self._remove(name[:-len(".json")])
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide cache; Streamlit keeps imported modules alive across reruns."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ParaphraseCache()
+        return _default_cache
@@ -0,0 +1,123 @@
+"""One-time participation check by email.
+
+The intro page asks for an email "to ensure each person only participates
+once". Scanning the responses CSV or the Google Sheet on every Start click
+would grow with the dataset, so submitted emails are kept in an SQLite index
+instead: one primary-key row per participant, holding only a salted HMAC of
+the normalized address (no raw emails). `has_participated` is a single
+indexed lookup; `record` inserts at submit.
+
+The salt comes from PARTICIPATION_SALT (set it, e.g. from Streamlit secrets,
+so the index alone cannot be checked against guessed addresses). Without it a
+random salt is created once and kept in the index file, so hashes stay stable
+across restarts.
+
+Backfill from existing responses (one scan, offline):
+    python participation.py --backfill csss_model1_responses_chatbot.csv
+"""
+import argparse
+import csv
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+INDEX_PATH = os.getenv("PARTICIPATION_DB", "participation.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS participants (
+    email_hash TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def normalize(email):
+    return email.strip().lower()
+
+
+class ParticipationIndex:
+    """Salted-hash email index on one SQLite connection, shared by all sessions."""
+
+    def __init__(self, path=INDEX_PATH, salt=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._salt = (salt or os.getenv("PARTICIPATION_SALT") or self._stored_salt()).encode("utf-8")
+
+    def _stored_salt(self):
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('salt', ?)", (secrets.token_hex(16),))
+            self._conn.commit()
+            return self._conn.execute("SELECT value FROM meta WHERE key = 'salt'").fetchone()[0]
+
+    def email_hash(self, email):
+        return hmac.new(self._salt, normalize(email).encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def has_participated(self, email):
+        key = self.email_hash(email)
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM participants WHERE email_hash = ?", (key,)).fetchone() is not None
+
+    def record(self, email):
+        """Mark `email` as having participated; False if it already was."""
+        key = self.email_hash(email)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO participants (email_hash, first_seen) VALUES (?, ?)", (key, time.time())
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM participants").fetchone()[0]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path=INDEX_PATH):
+    """Process-wide ParticipationIndex for `path`."""
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = ParticipationIndex(path)
+        return _indexes[path]
+
+
+def backfill(index, csv_path, column="email"):
+    """Record every address in `column` of a responses CSV; returns how many were new."""
+    added = 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get(column):
+                added += index.record(row[column])
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the one-time participation index.")
+    parser.add_argument("--db", default=INDEX_PATH, help="index file to create or extend")
+    parser.add_argument("--backfill", metavar="CSV", action="append", default=[],
+                        help="record the emails of an existing responses CSV (repeatable)")
+    parser.add_argument("--check", metavar="EMAIL", help="report whether EMAIL has participated")
+    args = parser.parse_args(argv)
+    index = ParticipationIndex(args.db)
+    for path in args.backfill:
+        print(f"{path}: {backfill(index, path)} new")
+    if args.check:
+        print("participated" if index.has_participated(args.check) else "not yet")
+    print(f"{args.db}: {len(index)} participants")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Write-behind persistence for submitted survey rows.
+
+`submit` journals the row to a local spool file (fsync'd) and returns. A
+background worker then writes pending rows to each sink (the responses CSV
+and Google Sheets) with tenacity retries, recording each (row, sink) that
+succeeded in a done-journal. A row a sink still rejects after its retries is
+queued again after a backoff (doubling up to REQUEUE_MAX_SECONDS), and on
+startup any spooled row not yet done for a sink is replayed, so neither a
+crash nor a Sheets outage loses submissions.
+Delivery is at-least-once; rows carry user_id for de-duplication.
+
+Each worker journals to its own pair of files (SPOOL_FILE and DONE_FILE with a
+random suffix) and holds an exclusive lock on its spool while it lives, so
+several app processes in one directory never compact each other's rows. On
+startup a worker adopts the journals whose lock is free, i.e. whose process
+has exited. Without fcntl (Windows) the unsuffixed files are used directly.
+"""
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; one process per directory then
+    fcntl = None
+
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+import gsheet_store
+import responses_store
+
+SPOOL_FILE = os.getenv("PERSIST_SPOOL_FILE", "submissions_spool.jsonl")
+DONE_FILE = os.getenv("PERSIST_DONE_FILE", "submissions_done.jsonl")
+RETRY_ATTEMPTS = int(os.getenv("PERSIST_RETRY_ATTEMPTS", "5"))
+REQUEUE_SECONDS = float(os.getenv("PERSIST_REQUEUE_SECONDS", "30"))
+REQUEUE_MAX_SECONDS = 600
+BATCH_SIZE = 20
+
+logger = logging.getLogger(__name__)
+
+
+def _append_line(path, record):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_lines(path):
+    records = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass  # torn last line from a crash mid-write
+    except OSError:
+        pass
+    return records
+
+
+def csv_sink(rows):
+    for row in rows:
+        responses_store.append_row(row)
+
+
+def _journal_path(path, suffix):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{suffix}{ext}"
+
+
+def _journals(spool_file, done_file):
+    """(spool, done) of every worker journaling under these paths, plus the unsuffixed pair."""
+    root, ext = os.path.splitext(spool_file)
+    pairs = [(spool_file, done_file)]
+    for path in sorted(glob.glob(glob.escape(root) + ".*" + glob.escape(ext))):
+        suffix = path[len(root) + 1:len(path) - len(ext)]
+        if re.fullmatch("[0-9a-f]{12}", suffix):
+            pairs.append((path, _journal_path(done_file, suffix)))
+    return pairs
+
+
+def _unfinished(spool_file, done_file, sinks):
+    """(entry, sinks still to write, sinks already written) for each spooled row not done everywhere."""
+    done = {(d["id"], d["sink"]) for d in _read_lines(done_file)}
+    unfinished = []
+    for entry in _read_lines(spool_file):
+        written = {name for name in sinks if (entry["id"], name) in done}
+        if len(written) < len(sinks):
+            unfinished.append((entry, set(sinks) - written, written))
+    return unfinished
+
+
+def default_sinks():
+    sinks = {"csv": csv_sink}
+    if os.path.exists(gsheet_store.CREDENTIALS_FILE):
+        sinks["gsheet"] = gsheet_store.append_rows
+    return sinks
+
+
+class PersistenceWorker:
+    def __init__(self, sinks, spool_file=SPOOL_FILE, done_file=DONE_FILE, retry_attempts=RETRY_ATTEMPTS, retry_wait=None,
+                 requeue_wait=REQUEUE_SECONDS):
+        self.sinks = sinks
+        self.spool_base = spool_file
+        self.done_base = done_file
+        self._claim = None
+        if fcntl is None:
+            self.spool_file, self.done_file = spool_file, done_file
+        else:
+            suffix = uuid.uuid4().hex[:12]
+            self.spool_file = _journal_path(spool_file, suffix)
+            self.done_file = _journal_path(done_file, suffix)
+            self._claim = open(self.spool_file, "a", encoding="utf-8")
+            fcntl.flock(self._claim, fcntl.LOCK_EX)
+        self.retry_attempts = retry_attempts
+        self.retry_wait = retry_wait or wait_exponential(multiplier=1, max=30)
+        self.requeue_wait = requeue_wait
+        self._queue = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._pending = {}  # entry id -> sink names not yet written
+        self._failures = {}  # entry id -> rounds a sink has failed it in a row
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._replay()
+        self._thread = threading.Thread(target=self._run, name="persistence", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, row):
+        """Journal `row` durably and queue it for every sink; returns its spool id."""
+        entry = {"id": str(uuid.uuid4()), "row": row}
+        with self._journal_lock:
+            _append_line(self.spool_file, entry)
+            self._pending[entry["id"]] = set(self.sinks)
+        self._queue.put(entry)
+        return entry["id"]
+
+    def flush(self):
+        """Block until every queued row has been attempted on every sink."""
+        self._queue.join()
+
+    def pending_count(self):
+        with self._journal_lock:
+            return len(self._pending)
+
+    def close(self):
+        """Release this worker's journal, letting another worker adopt what is left in it."""
+        if self._claim is not None:
+            fcntl.flock(self._claim, fcntl.LOCK_UN)
+            self._claim.close()
+            self._claim = None
+
+    def _replay(self):
+        if fcntl is None:
+            for entry, sinks, _ in _unfinished(self.spool_file, self.done_file, self.sinks):
+                self._pending[entry["id"]] = sinks
+                self._queue.put(entry)
+        else:
+            for spool_file, done_file in _journals(self.spool_base, self.done_base):
+                if spool_file != self.spool_file:
+                    self._adopt(spool_file, done_file)
+        if not self._pending:
+            self._compact()
+
+    def _adopt(self, spool_file, done_file):
+        # Move an exited worker's unfinished rows into this worker's journal
+        try:
+            f = open(spool_file, encoding="utf-8")
+        except OSError:
+            return
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return  # its process is still running
+            if os.fstat(f.fileno()).st_nlink == 0:
+                return  # adopted by another worker while we waited
+            for entry, sinks, written in _unfinished(spool_file, done_file, self.sinks):
+                _append_line(self.spool_file, entry)
+                for name in written:
+                    _append_line(self.done_file, {"id": entry["id"], "sink": name})
+                self._pending[entry["id"]] = sinks
+                self._queue.put(entry)
+            for path in (spool_file, done_file):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _compact(self):
+        # Caller holds self._journal_lock or runs before the worker starts. Truncated
+        # rather than removed: this worker's lock is on the spool file itself.
+        for path in (self.spool_file, self.done_file):
+            open(path, "w").close()
+
+    def _write(self, name, entries):
+        for attempt in Retrying(stop=stop_after_attempt(self.retry_attempts), wait=self.retry_wait, reraise=True):
+            with attempt:
+                self.sinks[name]([entry["row"] for entry in entries])
+        with self._journal_lock:
+            for entry in entries:
+                _append_line(self.done_file, {"id": entry["id"], "sink": name})
+                pending = self._pending.get(entry["id"])
+                if pending is not None:
+                    pending.discard(name)
+                    if not pending:
+                        del self._pending[entry["id"]]
+                        self._failures.pop(entry["id"], None)
+
+    def _requeue_later(self, entries):
+        with self._journal_lock:
+            rounds = 1 + max(self._failures.get(entry["id"], 0) for entry in entries)
+            for entry in entries:
+                self._failures[entry["id"]] = rounds
+        delay = min(REQUEUE_MAX_SECONDS, self.requeue_wait * 2 ** (rounds - 1))
+        timer = threading.Timer(delay, self._requeue, [entries])
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, entries):
+        with self._journal_lock:
+            entries = [entry for entry in entries if entry["id"] in self._pending]
+        for entry in entries:
+            self._queue.put(entry)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            failed = {}
+            try:
+                for name in self.sinks:
+                    with self._journal_lock:
+                        entries = [e for e in batch if name in self._pending.get(e["id"], ())]
+                    if not entries:
+                        continue
+                    try:
+                        self._write(name, entries)
+                    except Exception:
+                        # Still in the spool and _pending; queued again after a backoff
+                        logger.exception("Could not persist %d row(s) to %s", len(entries), name)
+                        failed.update((entry["id"], entry) for entry in entries)
+                if failed:
+                    self._requeue_later(list(failed.values()))
+                with self._journal_lock:
+                    if not self._pending:
+                        self._compact()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """Process-wide worker, started (and the spool replayed) on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = PersistenceWorker(default_sinks()).start()
+        return _worker
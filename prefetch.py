@@ -0,0 +1,94 @@
+"""Speculative prefetch of the next bot turn.
+
+While a question is on screen, every Likert branch's next message is generated
+in the background. When the participant clicks, the chosen branch is taken
+(usually already finished) and the others are cancelled or discarded.
+Branches given as coroutine functions run on the shared event loop
+(llm_client.submit) rather than on the thread pool. Branches run at the
+scheduler's "prefetch" priority (llm_scheduler.py), below any turn a
+participant is waiting on; the chosen one is raised to "interactive".
+"""
+import contextvars
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_client
+import llm_scheduler
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_TURNS", "1") == "1"
+MAX_WORKERS = int(os.getenv("PREFETCH_MAX_WORKERS", "32"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool shared by every session's prefetcher."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+
+class TurnPrefetcher:
+    """Holds the in-flight branches for the one turn a session is showing."""
+
+    def __init__(self, enabled=PREFETCH_ENABLED):
+        self.enabled = enabled
+        self.turn = None
+        self.futures = {}
+        self.coroutines = set()  # answers whose branch runs on the event loop
+        self.priorities = {}
+
+    def start(self, turn, branches):
+        """Begin generating `branches` ({answer: (fn, args)}) for `turn`.
+        Calling it again for the same turn (e.g. on a rerun) is a no-op."""
+        if not self.enabled or turn == self.turn:
+            return
+        self.discard()
+        self.turn = turn
+        self.coroutines = {answer for answer, (fn, _) in branches.items() if inspect.iscoroutinefunction(fn)}
+        # Each branch runs in a copy of the caller's context (e.g. the llm_metrics session)
+        for answer, (fn, args) in branches.items():
+            context = contextvars.copy_context()
+            self.priorities[answer] = llm_scheduler.Priority(llm_scheduler.PREFETCH)
+            context.run(llm_scheduler.set_priority, self.priorities[answer])
+            if answer in self.coroutines:
+                self.futures[answer] = context.run(llm_client.submit, fn(*args))
+            else:
+                self.futures[answer] = get_executor().submit(context.run, fn, *args)
+
+    def take(self, turn, answer, fn, *args, timeout=None, **kwargs):
+        """Result for the chosen branch, falling back to calling
+        `fn(*args, **kwargs)` directly if it was never prefetched, had not
+        started yet, failed, or is not finished within `timeout` seconds."""
+        future = self.futures.pop(answer, None) if turn == self.turn else None
+        priority = self.priorities.get(answer)
+        queued = future is not None and answer not in self.coroutines and future.cancel()
+        self.discard()
+        if queued:
+            # Still behind other sessions' branches in the pool: waiting would only eat the budget
+            return fn(*args, **kwargs)
+        if future is not None and not future.cancelled():
+            if not future.done():
+                priority.raise_to(llm_scheduler.INTERACTIVE)
+            try:
+                return future.result(timeout=timeout)
+            except Exception:
+                pass
+        return fn(*args, **kwargs)
+
+    def discard(self):
+        """Cancel branches that have not started; running ones finish
+        unobserved. Coroutine branches are always running, and cancelling one
+        would drop its pooled connection mid-request."""
+        for answer, future in self.futures.items():
+            if answer not in self.coroutines:
+                future.cancel()
+        self.turn = None
+        self.futures = {}
+        self.coroutines = set()
+        self.priorities = {}
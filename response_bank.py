@@ -0,0 +1,152 @@
+"""Offline bank of pre-generated chatbot messages.
+
+The input space is tiny (11 questions x 5 answers), so every message either
+arm of the chat_model1.py chatbot can send is generated ahead of time, N
+variants each, and stored in an indexed SQLite file. Serving from the bank costs no LLM calls.
+
+Build (resumable; existing variants are kept):
+    python response_bank.py --out response_bank.sqlite --variants 5
+Serve:
+    RESPONSE_BANK_PATH=response_bank.sqlite streamlit run chat_model1.py
+"""
+import argparse
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    kind TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL DEFAULT '',
+    variant INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (kind, question, answer, variant)
+)
+"""
+
+
+class ResponseBank:
+    """Read-only view of a bank file, loaded into memory once."""
+
+    def __init__(self, path):
+        self.path = path
+        self._messages = {}
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for kind, question, answer, text in conn.execute(
+                "SELECT kind, question, answer, text FROM messages ORDER BY variant"
+            ):
+                self._messages.setdefault((kind, question, answer), []).append(text)
+        finally:
+            conn.close()
+
+    def __len__(self):
+        return sum(len(texts) for texts in self._messages.values())
+
+    def variants(self, kind, question, answer=""):
+        return list(self._messages.get((kind, question, answer), []))
+
+    def sample(self, kind, question, answer=""):
+        """A random variant, or None if the bank has nothing for this key."""
+        texts = self._messages.get((kind, question, answer))
+        return random.choice(texts) if texts else None
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_bank(path):
+    """Process-wide ResponseBank for `path`."""
+    with _banks_lock:
+        if path not in _banks:
+            _banks[path] = ResponseBank(path)
+        return _banks[path]
+
+
+def bank_jobs(variants, paraphrases, generators):
+    """(kind, question, answer, variant, fn, args) for every message the chatbot can send."""
+    questions = generators.csss_questions
+    jobs = []
+    for q_idx, question in enumerate(questions):
+        for v in range(variants):
+            jobs.append(("paraphrase", question, "", v, generators.generate_question_paraphrased, (question,)))
+            # model1_csss arm
+            jobs.append(("paraphrase_empathy", question, "", v, generators.generate_question_with_empathy, (question,)))
+            jobs.append(("followup_question", question, "", v, generators.generate_followup, (question,)))
+        for opt in generators.likert_options:
+            if opt in ["Often", "Very Often"]:
+                for v in range(variants):
+                    jobs.append(("followup", question, opt, v, generators.generate_followup_with_empathy, (question, opt)))
+            # Reached directly for low answers and after the follow-up for high ones
+            if q_idx + 1 < len(questions):
+                next_variants = paraphrases.get(questions[q_idx + 1]) or [questions[q_idx + 1]]
+                for v in range(variants):
+                    jobs.append((
+                        "empathy_next", question, opt, v, generators.generate_empathy_plus_next_question,
+                        (question, opt, next_variants[v % len(next_variants)]),
+                    ))
+    return jobs
+
+
+def build(path, variants, max_workers=8):
+    """Generate every missing (kind, question, answer, variant) row into `path`."""
+    import chat_generators
+    import llm_scheduler
+    chat_generators.bank = None  # always generate live while building
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute(SCHEMA)
+    conn.commit()
+    existing = set(conn.execute("SELECT kind, question, answer, variant FROM messages"))
+    write_lock = threading.Lock()
+
+    def run(job):
+        kind, question, answer, variant, fn, args = job
+        # Offline work yields to live sessions, and each variant must be its own sample
+        llm_scheduler.set_priority(llm_scheduler.BACKGROUND)
+        llm_scheduler.set_coalescing(False)
+        text = fn(*args)
+        with write_lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO messages (kind, question, answer, variant, text) VALUES (?, ?, ?, ?, ?)",
+                (kind, question, answer, variant, text),
+            )
+            conn.commit()
+        return kind
+
+    def pending(jobs):
+        return [job for job in jobs if job[:4] not in existing]
+
+    # Paraphrases first: the empathy+next transitions embed them
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        jobs = [job for job in bank_jobs(variants, {}, chat_generators) if job[0] == "paraphrase"]
+        list(executor.map(run, pending(jobs)))
+        paraphrases = {}
+        for question, text in conn.execute(
+            "SELECT question, text FROM messages WHERE kind = 'paraphrase' ORDER BY variant"
+        ):
+            paraphrases.setdefault(question, []).append(text)
+        jobs = [job for job in bank_jobs(variants, paraphrases, chat_generators) if job[0] != "paraphrase"]
+        list(executor.map(run, pending(jobs)))
+
+    total = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    conn.close()
+    return total
+
+
+def main(argv=None):
+    import settings  # noqa: F401  (loads .env before chat_generators and the LLM modules read their settings)
+    parser = argparse.ArgumentParser(description="Pre-generate the chat_model1 response bank.")
+    parser.add_argument("--out", default="response_bank.sqlite", help="bank file to create or extend")
+    parser.add_argument("--variants", type=int, default=5, help="variants per message")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent OpenAI requests")
+    args = parser.parse_args(argv)
+    total = build(args.out, args.variants, args.workers)
+    print(f"{args.out}: {total} messages")
+
+
+if __name__ == "__main__":
+    main()
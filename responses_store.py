@@ -0,0 +1,61 @@
+"""Append-only store for submitted survey rows.
+
+Each submit appends one CSV line under an exclusive file lock, writing the
+header only when the file is empty. Cost no longer grows with the dataset and
+concurrent submits cannot drop each other's rows. The file is only rewritten
+if a row brings columns the existing header does not have.
+"""
+import csv
+import io
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the thread lock still serialises this process
+    fcntl = None
+
+RESPONSES_FILE = "csss_model1_responses_chatbot.csv"
+
+_lock = threading.Lock()
+
+
+def _read_header(f):
+    f.seek(0)
+    line = f.readline()
+    return next(csv.reader([line])) if line.strip() else []
+
+
+def _rewrite_with_columns(f, columns):
+    # Rare schema change: widen every existing row to the new column set.
+    f.seek(0)
+    rows = list(csv.DictReader(f))
+    f.seek(0)
+    f.truncate()
+    writer = csv.DictWriter(f, fieldnames=columns, restval="")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def append_row(row, path=RESPONSES_FILE):
+    with _lock, open(path, "a+", newline="", encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            header = _read_header(f)
+            new_columns = [key for key in row if key not in header]
+            if header and new_columns:
+                header = header + new_columns
+                _rewrite_with_columns(f, header)
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=header or list(row), restval="")
+            if not header:
+                writer.writeheader()
+            writer.writerow(row)
+            f.seek(0, os.SEEK_END)
+            f.write(buffer.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,127 @@
+"""Durable checkpoints of chatbot sessions, for resuming after a refresh.
+
+A browser refresh or a dropped websocket starts a new Streamlit session with
+empty session_state. chat_model1.py therefore checkpoints each session here
+after every delivered turn (and on page changes), keyed by session_id, and
+puts a random resume token in the URL (?resume=...). A returning participant
+is restored from the checkpoint: same session, arm, paraphrased questions and
+every message generated so far, so nothing is paid for twice.
+
+Only a SHA-256 of each token is stored. A checkpoint holds the intro-page
+answers (email included) until the survey is submitted, when it is deleted;
+abandoned ones expire after SESSION_TTL_SECONDS and are deleted on the next
+save at most SESSION_PRUNE_INTERVAL_SECONDS later.
+
+    python session_store.py            # how many checkpoints, after pruning expired ones
+"""
+import argparse
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+STORE_PATH = os.getenv("SESSION_STORE_PATH", "sessions.sqlite")
+TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+PRUNE_INTERVAL_SECONDS = float(os.getenv("SESSION_PRUNE_INTERVAL_SECONDS", "600"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    token_hash TEXT NOT NULL UNIQUE,
+    updated REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+"""
+
+
+def new_token():
+    return secrets.token_urlsafe(16)
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class SessionStore:
+    """Session checkpoints on one SQLite connection, shared by all sessions."""
+
+    def __init__(self, path=STORE_PATH, ttl=TTL_SECONDS, prune_interval=PRUNE_INTERVAL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._pruned = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # A checkpoint per click: WAL appends instead of rewriting pages, and skips most fsyncs
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.prune()
+
+    def save(self, session_id, token, data):
+        """Replace the checkpoint of `session_id` with `data` (JSON-serializable)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, token_hash, updated, data) VALUES (?, ?, ?, ?)",
+                (session_id, token_hash(token), time.time(), json.dumps(data, ensure_ascii=False)),
+            )
+            self._conn.commit()
+        if time.monotonic() - self._pruned >= self.prune_interval:
+            self.prune()
+
+    def load(self, token):
+        """(session_id, data) saved under `token`, or None if unknown or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, updated, data FROM sessions WHERE token_hash = ?", (token_hash(token),)
+            ).fetchone()
+        if row is None or (self.ttl > 0 and time.time() - row[1] > self.ttl):
+            return None
+        return row[0], json.loads(row[2])
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def prune(self):
+        """Drop expired checkpoints; returns how many."""
+        if self.ttl <= 0:
+            return 0
+        with self._lock:
+            self._pruned = time.monotonic()
+            cursor = self._conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=STORE_PATH):
+    """Process-wide SessionStore for `path`."""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SessionStore(path)
+        return _stores[path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the session checkpoint store.")
+    parser.add_argument("--db", default=STORE_PATH, help="checkpoint store to open")
+    args = parser.parse_args(argv)
+    store = SessionStore(args.db)
+    print(f"{args.db}: {len(store)} checkpoints")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""Loads .env into the environment, once per process.
+
+Modules here read their settings from os.getenv at import, so entry points
+import this module before any of them. Streamlit re-executes chat_model1.py
+on every click, but an imported module is not run again.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+from tenacity import wait_none
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import persistence  # noqa: E402
+
+
+class FlakySink:
+    """Fails its first `failures` calls, then records what it is given."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.rows = []
+
+    def __call__(self, rows):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("sink down")
+        self.rows.extend(rows)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def make_worker(tmp_path, sinks):
+    return persistence.PersistenceWorker(
+        sinks, str(tmp_path / "spool.jsonl"), str(tmp_path / "done.jsonl"),
+        retry_attempts=2, retry_wait=wait_none(), requeue_wait=0.01,
+    ).start()
+
+
+def test_row_is_written_once_a_failing_sink_recovers(tmp_path):
+    # Two rounds of two attempts fail: the row must be queued again, not left for a restart
+    sink = FlakySink(failures=4)
+    csv_rows = []
+    worker = make_worker(tmp_path, {"csv": csv_rows.extend, "gsheet": sink})
+
+    worker.submit({"user_id": "a"})
+    assert wait_for(lambda: worker.pending_count() == 0)
+    worker.flush()
+
+    assert sink.rows == [{"user_id": "a"}]
+    assert csv_rows == [{"user_id": "a"}]
+
+
+def test_rows_left_by_an_exited_worker_are_replayed(tmp_path):
+    sink = FlakySink(failures=0)
+    first = persistence.PersistenceWorker({"csv": sink}, str(tmp_path / "spool.jsonl"), str(tmp_path / "done.jsonl"))
+    first.submit({"user_id": "b"})  # journaled, but the worker was never started
+    first.close()  # as when its process exits
+
+    second = make_worker(tmp_path, {"csv": sink})
+    second.flush()
+
+    assert sink.rows == [{"user_id": "b"}]
+    assert second.pending_count() == 0
+
+
+def test_a_running_workers_rows_are_left_to_it(tmp_path):
+    first_rows, second_rows = [], []
+    first = persistence.PersistenceWorker({"csv": first_rows.extend}, str(tmp_path / "spool.jsonl"),
+                                          str(tmp_path / "done.jsonl"))
+    first.submit({"user_id": "c"})
+
+    second = make_worker(tmp_path, {"csv": second_rows.extend})
+    second.submit({"user_id": "d"})
+    second.flush()  # compacts its own journal, not the first worker's
+    first.start().flush()
+
+    assert first_rows == [{"user_id": "c"}]
+    assert second_rows == [{"user_id": "d"}]